@@ -1,10 +1,16 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
-from PyQt5.QtGui import QImage, QPixmap
 import subprocess
 import cv2
 import face_recognition
 import numpy as np
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sidebar"))
+from capture import FrameGrabber
+from faces import detect_faces, detection_scale_for, FaceQualityGate
+from frame_channel import FrameChannel
+from video_view import VideoView
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -60,15 +66,8 @@ class Ui_MainWindow(object):
         self.lineEdit.setStyleSheet("color: rgb(255, 255, 255); font: 18pt 'MS Shell Dlg 2';")
         self.lineEdit.setObjectName("lineEdit")
 
-        self.image_box = QtWidgets.QLabel(self.main_menu)
+        self.image_box = VideoView(self.main_menu, background="#333333", border="#4a90e2")
         self.image_box.setGeometry(QtCore.QRect(60, 200, 431, 361))
-        self.image_box.setStyleSheet("""
-            QLabel {
-                border: 2px solid #4a90e2;
-                border-radius: 5px;
-                background-color: #333333;
-            }
-        """)
         self.image_box.setObjectName("image_box")
 
         MainWindow.setCentralWidget(self.centralwidget)
@@ -88,7 +87,7 @@ class Ui_MainWindow(object):
         # Start the camera feed initially
         self.face_recognition_thread = None
         self.camera_thread = CameraThread()
-        self.camera_thread.change_pixmap_signal.connect(self.update_image_box)
+        self.camera_thread.frames.frame_ready.connect(self.update_image_box)
         self.camera_thread.start()
 
         # Connect the LOGIN button to start face recognition
@@ -101,49 +100,43 @@ class Ui_MainWindow(object):
         self.lineEdit.setText(_translate("MainWindow", "EYE OF THE SAURON"))
 
     def update_image_box(self, qt_img):
-        self.image_box.setPixmap(qt_img)
+        self.image_box.set_image(qt_img)
 
     def start_face_recognition(self):
         if self.face_recognition_thread is None or not self.face_recognition_thread.isRunning():
             self.face_recognition_thread = FaceRecognitionThread()
-            self.face_recognition_thread.change_pixmap_signal.connect(self.update_image_box)
+            self.face_recognition_thread.frames.frame_ready.connect(self.update_image_box)
             self.face_recognition_thread.start()
         else:
             print("Face recognition is already running.")
 
 import login_rc as login_rc
 
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QThread
 
 class CameraThread(QThread):
-    change_pixmap_signal = pyqtSignal(QPixmap)
-
     def __init__(self):
         super().__init__()
         self.camera_index = 0 #//camera index 
-        self.cap = cv2.VideoCapture(self.camera_index)
+        self.cap = FrameGrabber(self.camera_index)  # Always hands out the newest frame
+        self.frames = FrameChannel()  # Newest frame only; the view scales it on the GPU
         if not self.cap.isOpened():
+            self.cap.release()
             raise ValueError(f"Unable to open camera feed with index: {self.camera_index}")
 
     def run(self):
-        while True:
+        while not self.cap.released:
             ret, frame = self.cap.read()
             if not ret:
                 continue
 
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
-            qt_img = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.change_pixmap_signal.emit(QPixmap.fromImage(qt_img))
+            self.frames.publish(frame)
 
     def stop(self):
         self.cap.release()
         cv2.destroyAllWindows()
 
 class FaceRecognitionThread(QThread):
-    change_pixmap_signal = pyqtSignal(QPixmap)
-
     def __init__(self):
         super().__init__()
         self.target_image_path = "target.png"
@@ -157,19 +150,30 @@ class FaceRecognitionThread(QThread):
         self.target_encoding = self.target_encodings[0]
 
         self.camera_index = 0
-        self.cap = cv2.VideoCapture(self.camera_index)
+        self.cap = FrameGrabber(self.camera_index)  # Always hands out the newest frame
+        self.frames = FrameChannel()  # Newest frame only; the view scales it on the GPU
         if not self.cap.isOpened():
+            self.cap.release()
             raise ValueError(f"Unable to open camera feed with index: {self.camera_index}")
 
+        # Frames above 720p are detected on a downscaled copy; set detection_scale to fix the
+        # scale, or min_face_size (px) to pick the smallest scale that still finds such faces
+        self.detection_scale = None
+        self.min_face_size = None
+        self.quality_gate = FaceQualityGate()
+
     def run(self):
-        while True:
+        while not self.cap.released:
             ret, frame = self.cap.read()
             if not ret:
                 continue
 
 
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
+            face_locations = detect_faces(rgb_frame, detection_scale_for(
+                rgb_frame.shape, self.detection_scale, self.min_face_size))
+            # Only faces good enough to give a useful embedding go to the encoder
+            face_locations = [location for location in self.quality_gate.filter(rgb_frame, face_locations) if location]
             face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
 
             detected = False
@@ -187,11 +191,7 @@ class FaceRecognitionThread(QThread):
                 cv2.destroyAllWindows()
                 QtWidgets.QApplication.quit()
 
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
-            qt_img = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.change_pixmap_signal.emit(QPixmap.fromImage(qt_img))
+            self.frames.publish(frame)
 
         self.cap.release()
         cv2.destroyAllWindows()
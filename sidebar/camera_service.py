@@ -0,0 +1,80 @@
+import face_store
+import gallery_store
+import inference
+
+_service = None
+
+
+class CameraService(object):
+    """Camera pipelines that live for the whole application; views attach and detach.
+
+    A pipeline (a CameraThread or anything with the same views ChannelSet and
+    pause/resume/stop methods) is created and started the first time a view
+    asks for its camera. It keeps its gallery, tracker and detector across page
+    switches, and is paused while no view is attached; a paused pipeline also
+    releases its capture device, so a hidden camera is not even decoded.
+    """
+
+    def __init__(self, camera_factory):
+        self.camera_factory = camera_factory
+        self._cameras = {}
+        self._views = {}
+
+    def camera(self, camera_index):
+        """The pipeline for camera_index, created and started on first use."""
+        camera = self._cameras.get(camera_index)
+        if camera is None:
+            camera = self.camera_factory(camera_index)
+            camera.pause()
+            camera.start()
+            self._cameras[camera_index] = camera
+            self._views[camera_index] = []
+        return camera
+
+    def attach(self, camera_index, channel):
+        """Publish the camera's frames to channel (a FrameChannel) and make sure it is running."""
+        camera = self.camera(camera_index)
+        camera.views.add(channel)
+        self._views[camera_index].append(channel)
+        camera.resume()
+        return camera
+
+    def detach(self, camera_index, channel):
+        """Stop publishing to channel; the camera pauses once no view is left."""
+        views = self._views.get(camera_index, [])
+        if channel not in views:
+            return
+        views.remove(channel)
+        camera = self._cameras[camera_index]
+        camera.views.remove(channel)
+        if not views:
+            camera.pause()
+
+    def shutdown(self):
+        """Stop every pipeline and wait for its thread to finish."""
+        for camera in self._cameras.values():
+            camera.stop()
+        for camera in self._cameras.values():
+            camera.wait()
+        self._cameras.clear()
+        self._views.clear()
+
+
+def get_camera_service(camera_factory):
+    """Return the application's CameraService, creating it with camera_factory on first use."""
+    global _service
+    if _service is None:
+        _service = CameraService(camera_factory)
+    return _service
+
+
+def shutdown_camera_service():
+    """Stop all camera pipelines, then flush what they left queued and stop the shared services."""
+    global _service
+    if _service is not None:
+        _service.shutdown()
+        _service = None
+    # Crops still queued were already counted per person, so they must reach the disk
+    face_store.close_all()
+    gallery_store.close_all()
+    inference.shutdown_all()
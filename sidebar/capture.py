@@ -0,0 +1,230 @@
+import threading
+import time
+import cv2
+
+_devices = {}
+_devices_lock = threading.Lock()
+_source_locks = {}  # Serialize opening and closing per source, so one slow device blocks only itself
+
+
+class CaptureDevice(object):
+    """One capture source, read on its own supervised thread into a one-slot buffer.
+
+    Devices are shared: the registry below keeps one per source, opened when
+    the first FrameGrabber subscribes and closed when the last one releases.
+    A device that fails to open, or fails max_failures reads in a row, is
+    released and reopened with exponential backoff (backoff_initial doubling
+    up to backoff_max seconds), so an unplugged camera sleeps instead of
+    spinning until it comes back.
+    """
+
+    def __init__(self, source, max_failures=5, backoff_initial=0.5, backoff_max=30.0):
+        self.source = source
+        self.max_failures = max_failures
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.grabbed = 0
+        self.subscribers = 0
+        self.state = "opening"
+        self.failures = 0  # Consecutive failed reads
+        self.read_failures = 0
+        self.reconnects = 0
+        self._frame = None
+        self._frame_time = 0.0
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._running = True
+        self.cap = cv2.VideoCapture(source)
+        self._set_state("ok" if self.cap.isOpened() else "down")
+        self._thread = threading.Thread(target=self._grab_loop, name=f"grab-{source}", daemon=True)
+        self._thread.start()
+
+    def isOpened(self):
+        cap = self.cap
+        return cap is not None and cap.isOpened()
+
+    def _set_state(self, state):
+        if state != self.state:
+            if state != "ok" or self.state != "opening":
+                print(f"Camera {self.source}: {self.state} -> {state}")
+            self.state = state
+
+    def _sleep(self, seconds):
+        # Interruptible, so close() never waits out a long backoff
+        with self._cond:
+            self._cond.wait_for(lambda: not self._running, seconds)
+
+    def _grab_loop(self):
+        delay = self.backoff_initial
+        while self._running:
+            if not self.isOpened():
+                if self.cap is not None:
+                    self.cap.release()
+                self.cap = cv2.VideoCapture(self.source)
+                if not self.isOpened():
+                    self._set_state("down")
+                    self._sleep(delay)
+                    delay = min(delay * 2, self.backoff_max)
+                    continue
+                self.reconnects += 1
+                self.failures = 0
+
+            ret, frame = self.cap.read()
+            if not ret:
+                self.failures += 1
+                self.read_failures += 1
+                if self.failures >= self.max_failures:
+                    # Unplugged or wedged: drop the handle and reopen it with backoff
+                    self._set_state("reconnecting")
+                    self.cap.release()
+                    self._sleep(delay)
+                    delay = min(delay * 2, self.backoff_max)
+                else:
+                    self._sleep(min(0.01 * 2 ** self.failures, self.backoff_initial))
+                continue
+
+            self.failures = 0
+            delay = self.backoff_initial
+            self._set_state("ok")
+            with self._cond:
+                self._frame = frame
+                self._frame_time = time.monotonic()
+                self._seq += 1
+                self.grabbed += 1
+                self._cond.notify_all()
+
+    def wait_newer(self, seq, timeout):
+        """Return (seq, frame, frame_time) for a frame newer than seq, or None on timeout/close."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > seq or not self._running, timeout):
+                return None
+            if self._seq <= seq:
+                return None
+            return self._seq, self._frame, self._frame_time
+
+    def health(self):
+        """State ("ok", "reconnecting" or "down"), failure counts and seconds since the last frame."""
+        return {
+            "source": self.source,
+            "state": self.state,
+            "grabbed": self.grabbed,
+            "failures": self.failures,
+            "read_failures": self.read_failures,
+            "reconnects": self.reconnects,
+            "frame_age": time.monotonic() - self._frame_time if self._frame_time else None,
+        }
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.cap is not None:
+            self.cap.release()
+
+
+def _source_lock(source):
+    with _devices_lock:
+        return _source_locks.setdefault(source, threading.Lock())
+
+
+def _subscribe(source):
+    with _source_lock(source):
+        with _devices_lock:
+            device = _devices.get(source)
+            if device is not None:
+                device.subscribers += 1
+                return device
+        # Opening can take seconds (or time out) for a missing camera; other sources carry on
+        device = CaptureDevice(source)
+        with _devices_lock:
+            # Shared even if it failed to open; its supervisor keeps retrying
+            device.subscribers = 1
+            _devices[source] = device
+        return device
+
+
+def _unsubscribe(device):
+    with _source_lock(device.source):
+        with _devices_lock:
+            device.subscribers -= 1
+            if device.subscribers > 0:
+                return
+            if _devices.get(device.source) is device:
+                del _devices[device.source]
+        # Closed before the next subscriber of this source may open it again
+        device.close()
+
+
+def capture_health():
+    """Health of every open capture device, keyed by source."""
+    with _devices_lock:
+        devices = list(_devices.values())
+    return {device.source: device.health() for device in devices}
+
+
+class FrameGrabber(object):
+    """A subscription to a shared capture device that always reads the newest frame.
+
+    Drop-in for the cv2.VideoCapture calls the camera loops make: read() returns
+    (ret, frame) with the freshest frame grabbed since this subscriber's previous
+    read, rather than whatever sat in the driver buffer. Any number of grabbers
+    may read the same source; each gets its own copy of the frame, and frames
+    it never saw are counted as dropped for that grabber. While the device is
+    down, read() waits read_timeout and returns (False, None) rather than
+    failing immediately, so the usual `if not ret: continue` loops idle.
+    """
+
+    def __init__(self, source, read_timeout=1.0):
+        self.source = source
+        self.read_timeout = read_timeout
+        self.delivered = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+        self._seq = 0
+        self._device = _subscribe(source)
+
+    def isOpened(self):
+        return self._device is not None and self._device.isOpened()
+
+    def read(self, timeout=None):
+        """Wait for a frame newer than the last one read; returns (ret, frame)."""
+        if self._device is None:
+            return False, None
+        latest = self._device.wait_newer(self._seq, self.read_timeout if timeout is None else timeout)
+        if latest is None:
+            return False, None
+        seq, frame, frame_time = latest
+        if self._seq:
+            self.dropped += seq - self._seq - 1
+        self._seq = seq
+        self.delivered += 1
+        self.last_latency = time.monotonic() - frame_time
+        # Subscribers draw on their frames, so each gets its own copy
+        return True, frame.copy()
+
+    @property
+    def released(self):
+        return self._device is None
+
+    def health(self):
+        """Health of the underlying device (see CaptureDevice.health)."""
+        if self._device is None:
+            return {"source": self.source, "state": "released"}
+        return self._device.health()
+
+    def stats(self):
+        """Frames delivered and dropped for this subscriber plus the age of the last frame read (ms)."""
+        return {
+            "grabbed": self._device.grabbed if self._device is not None else 0,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "latency_ms": 1000.0 * self.last_latency,
+        }
+
+    def release(self):
+        """Unsubscribe; the device closes when its last subscriber releases it."""
+        device, self._device = self._device, None
+        if device is not None:
+            _unsubscribe(device)
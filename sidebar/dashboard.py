@@ -1,10 +1,27 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
-from PyQt5.QtGui import QImage, QPixmap
 import cv2
-import os
-import face_recognition
+import threading
+import time
 import numpy as np
-from ultralytics import YOLO 
+from shared_gallery import get_shared_gallery
+from inference import get_detector
+from faces import boxes_to_locations, encode_faces, FaceQualityGate
+from face_store import get_face_writer
+from capture import FrameGrabber
+from motion import MotionGate, expand_region
+from workers import CameraProcess
+from tracking import IouTracker, FlowPropagator, DetectionCadence
+from camera_service import get_camera_service
+from frame_channel import FrameChannel, ChannelSet
+from video_view import VideoView
+
+YOLO_WEIGHTS = "D:/Project-6th/pramod/project/yolo/best.pt"
+CAMERA_MODE = "thread"  # "process" runs capture, detection and encoding in one worker process per camera
+
+
+def create_camera(camera_index):
+    camera_class = ProcessCameraThread if CAMERA_MODE == "process" else CameraThread
+    return camera_class(camera_index)
 
 class Ui_Dashboard(object):
     def setupUi(self, Dashboard):
@@ -14,14 +31,12 @@ class Ui_Dashboard(object):
         self.verticalLayout = QtWidgets.QVBoxLayout(Dashboard)
         Dashboard.setLayout(self.verticalLayout)
 
-        self.camera_widget1 = QtWidgets.QLabel(Dashboard)
+        self.camera_widget1 = VideoView(Dashboard, border="#4a90e2")  # Scales on the GPU
         self.camera_widget1.setFixedSize(800, 400)
-        self.camera_widget1.setStyleSheet("background-color: rgb(0, 0, 0); border: 2px solid #4a90e2; border-radius: 5px;")
         self.camera_widget1.setObjectName("camera_widget1")
 
-        self.camera_widget2 = QtWidgets.QLabel(Dashboard)
+        self.camera_widget2 = VideoView(Dashboard, border="#4a90e2")  # Scales on the GPU
         self.camera_widget2.setFixedSize(800, 400)
-        self.camera_widget2.setStyleSheet("background-color: rgb(0, 0, 0); border: 2px solid #4a90e2; border-radius: 5px;")
         self.camera_widget2.setObjectName("camera_widget2")
 
         self.start_button = QtWidgets.QPushButton(Dashboard)
@@ -33,22 +48,30 @@ class Ui_Dashboard(object):
         self.verticalLayout.addWidget(self.camera_widget2)
         self.verticalLayout.addWidget(self.start_button)
 
-        self.camera_thread1 = CameraThread(0)  # Camera index 0
-        self.camera_thread2 = CameraThread(1)  # Camera index 1
-        self.camera_thread1.change_pixmap_signal.connect(self.update_camera_widget1)
-        self.camera_thread2.change_pixmap_signal.connect(self.update_camera_widget2)
-
-        self.camera_thread1.start()
-        self.camera_thread2.start()
+        # Camera pipelines outlive the page; the dashboard only attaches to them
+        self.camera_service = get_camera_service(create_camera)
+        # Only the newest frame per view waits for the GUI, already scaled to the label
+        self.camera_channel1 = FrameChannel((800, 400))
+        self.camera_channel2 = FrameChannel((800, 400))
+        self.camera_channel1.frame_ready.connect(self.update_camera_widget1)
+        self.camera_channel2.frame_ready.connect(self.update_camera_widget2)
+        self.camera_thread1 = self.camera_service.attach(0, self.camera_channel1)  # Camera index 0
+        self.camera_thread2 = self.camera_service.attach(1, self.camera_channel2)  # Camera index 1
 
         self.start_button.clicked.connect(self.toggle_ai_processing)
-        self.ai_processing_active = False
+        self.ai_processing_active = self.camera_thread1.ai_processing
+        self.start_button.setText("Stop AI" if self.ai_processing_active else "AI")
+
+    def detach(self):
+        """Stop receiving frames; cameras with no other view pause until the dashboard is shown again."""
+        self.camera_service.detach(0, self.camera_channel1)
+        self.camera_service.detach(1, self.camera_channel2)
 
     def update_camera_widget1(self, qt_img):
-        self.camera_widget1.setPixmap(qt_img)
+        self.camera_widget1.set_image(qt_img)
 
     def update_camera_widget2(self, qt_img):
-        self.camera_widget2.setPixmap(qt_img)
+        self.camera_widget2.set_image(qt_img)
 
     def toggle_ai_processing(self):
         if self.ai_processing_active:
@@ -64,86 +87,175 @@ class Ui_Dashboard(object):
         self.ai_processing_active = not self.ai_processing_active
 
 class CameraThread(QtCore.QThread):
-    change_pixmap_signal = QtCore.pyqtSignal(QPixmap)
-
-    def __init__(self, camera_index):
+    def __init__(self, camera_index, gallery_mode="exact"):
         super().__init__()
         self.camera_index = camera_index
-        self.cap = cv2.VideoCapture(self.camera_index)
-        self.yolo_model = YOLO("D:/Project-6th/pramod/project/yolo/best.pt")  # Load the YOLO model for face detection
+        self.views = ChannelSet()  # FrameChannels of the views showing this camera
+        self.cap = None  # FrameGrabber, subscribed only while the camera is shown
+        self.detector = get_detector(YOLO_WEIGHTS)  # Shared YOLO face detector, loaded once per process
         self.face_folder = "detected_faces"
         self.max_images_per_person = 5
-        self.face_encodings = {}  
-        self.face_id_map = {}  
-        self.next_face_id = 0  
+        self.gallery = get_shared_gallery(self.face_folder, gallery_mode)  # One gallery for all cameras
         self.similarity_threshold = 0.6  
+        self.face_box_padding = 0.1  # Grow YOLO boxes by 10% so landmarks see the whole face
+        self.tracker = IouTracker()  # Faces are encoded once per track, not once per frame
+        self.track_refresh_frames = 30  # Re-encode a track at least this often (0 = never)
+        self.appearance_change_threshold = 0.5  # Re-encode when the crop changes this much
+        self.frame_index = 0
+        self.encodes_skipped = 0
+        self.cadence = DetectionCadence(every=5, target_fps=15)  # Full YOLO pass every k frames, adaptive
+        self.propagator = FlowPropagator()
+        self.prev_gray = None
+        self.track_confidence = 1.0
+        self.motion_gate = MotionGate(pixel_threshold=25, min_area=0.002)  # Per-camera change thresholds
+        self.detect_in_motion_region = False  # Run YOLO only on the changed part of the frame
+        self.detections_gated = 0
+        self.quality_gate = FaceQualityGate(threshold=0.5)  # Tiny, blurred, dark and profile faces skip the encoder
+        self.quality_patience = 15  # Frames a new track waits for a good sample before settling for its best
+        self.quality_encodes_skipped = 0
         self.ai_processing = False
-
-        if not os.path.exists(self.face_folder):
-            os.makedirs(self.face_folder)
+        self.detector_failed = False
+        self.face_writer = get_face_writer(self.face_folder, self.max_images_per_person)
+        self._running = True
+        self._active = threading.Event()  # Cleared while no view shows this camera
+        self._active.set()
 
     def run(self):
-        while True:
-            ret, frame = self.cap.read()
-            if not ret:
-                continue
+        try:
+            while self._running:
+                if not self._active.is_set():
+                    # Nobody is watching: give the device back and skip detection and drawing until resumed
+                    if self.cap is not None:
+                        self.cap.release()
+                        self.cap = None
+                    self.reset_tracking()
+                    self._active.wait(0.1)
+                    continue
+                if self.cap is None:
+                    self.cap = FrameGrabber(self.camera_index)  # Always hands out the newest frame
+                ret, frame = self.cap.read()
+                if not ret:
+                    continue
+
+                if self.ai_processing:
+                    started = time.perf_counter()
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    detected = self.prev_gray is None or self.cadence.should_detect(self.track_confidence)
+                    changed, region = self.motion_gate.check(frame)
+                    if detected and not changed and self.prev_gray is not None:
+                        # Nothing moved, so YOLO would only find what the tracker already has
+                        detected = False
+                        self.detections_gated += 1
+                        self.cadence.defer()
+                    if detected:
+                        if self.detect_in_motion_region and region is not None:
+                            # The changed area plus the faces we already track, so still faces are not lost
+                            x1, y1, x2, y2 = expand_region(region, [track.box for track in self.tracker.active_tracks()], frame.shape)
+                            boxes = self.detect_faces(frame[y1:y2, x1:x2])
+                            if boxes is not None:
+                                boxes = boxes + np.array([x1, y1, x1, y1])
+                        else:
+                            boxes = self.detect_faces(frame)  # Batched with the other cameras
+                        if boxes is None:
+                            # The detector failed; show the frame undecorated and start over on the next one
+                            self.reset_tracking()
+                            self.views.publish(frame)
+                            continue
+                        tracks = self.tracker.update(boxes)
+                        self.track_confidence = 1.0
+                    else:
+                        # Move the boxes with optical flow instead of running the detector
+                        tracks = self.tracker.active_tracks()
+                        moved, confidences = self.propagator.propagate(self.prev_gray, gray, [track.box for track in tracks])
+                        tracks = self.tracker.follow(tracks, moved, confidences)
+                        self.track_confidence = min(confidences, default=1.0)
+                    self.prev_gray = gray
+                    self.frame_index += 1
+                    current_face_ids = []
 
-            if self.ai_processing:
-                results = self.yolo_model(frame)  # Perform face detection with YOLO
-                current_face_ids = []
-                for result in results:
-                    # Bounding box format: [x1, y1, x2, y2]
-                    for box in result.boxes.xyxy.cpu().numpy():
-                        x1, y1, x2, y2 = box.astype(int)
-                        face_img = frame[y1:y2, x1:x2]
-                        face_encoding = self.get_face_encoding(face_img)
-                        
+                    # Only encode tracks that are new, changed appearance or are due a refresh
+                    stale_tracks = [track for track in tracks if track.needs_encoding(
+                        frame, self.frame_index, self.track_refresh_frames, self.appearance_change_threshold)]
+                    faces = []
+                    face_encodings = self.get_face_encodings(frame, [track.box for track in stale_tracks], stale_tracks)
+                    for track, face_encoding in zip(stale_tracks, face_encodings):
                         if face_encoding is not None:
-                            face_encoding_tuple = tuple(face_encoding.flatten())
-                            matched_id = self.find_face_id(face_encoding)
-                            
-                            if matched_id is not None:
-                                person_folder = os.path.join(self.face_folder, f'person_{matched_id}')
-                                if len(os.listdir(person_folder)) < self.max_images_per_person:
-                                    self.save_face_image(face_img, matched_id)
-                                current_face_ids.append(matched_id)
-                            else:
-                                new_id = self.next_face_id
-                                person_folder = os.path.join(self.face_folder, f'person_{new_id}')
-                                if not os.path.exists(person_folder):
-                                    os.makedirs(person_folder)
-                                self.save_face_image(face_img, new_id)
-                                self.face_encodings[new_id] = face_encoding
-                                self.face_id_map[face_encoding_tuple] = new_id
-                                self.next_face_id += 1
-                                current_face_ids.append(new_id)
-                            
-                            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                            cv2.putText(frame, f'ID: {new_id if matched_id is None else matched_id}', 
-                                        (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-            
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
-            qt_img = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.change_pixmap_signal.emit(QPixmap.fromImage(qt_img))
-
-    def get_face_encoding(self, face_img):
-        face_img_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-        encodings = face_recognition.face_encodings(face_img_rgb)
-        return encodings[0] if encodings else None
-
-    def find_face_id(self, face_encoding):
-        for face_id, encoding in self.face_encodings.items():
-            matches = face_recognition.compare_faces([encoding], face_encoding, tolerance=self.similarity_threshold)
-            if matches[0]:
-                return face_id
-        return None
+                            faces.append((track, face_encoding))
+                    self.encodes_skipped += len(tracks) - len(stale_tracks)
+
+                    # Match every face in the frame against the gallery in one batched call
+                    matches = self.gallery.match_many([face[1] for face in faces], self.similarity_threshold) if faces else []
+                    for (track, face_encoding), (matched_id, _) in zip(faces, matches):
+                        x1, y1, x2, y2 = track.box
+                        face_img = frame[max(y1, 0):y2, max(x1, 0):x2]
+                        if matched_id is None:
+                            matched_id = self.gallery.add_identity(face_encoding, self.similarity_threshold)
+                        self.save_face_image(face_img, matched_id)
+                        track.assign_identity(matched_id, self.frame_index)
+
+                    for track in tracks:
+                        if track.face_id is None:
+                            continue
+                        x1, y1, x2, y2 = track.box
+                        current_face_ids.append(track.face_id)
+                        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+                        cv2.putText(frame, f'ID: {track.face_id}', 
+                                    (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+                    self.cadence.record(detected, time.perf_counter() - started)
+                else:
+                    self.reset_tracking()
+
+                self.views.publish(frame)  # Scaled and converted per view; the GUI only takes the newest
+        finally:
+            # Always give the device back, even if the loop died on an error
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+
+    def detect_faces(self, frame):
+        """YOLO boxes of frame, or None if the detector failed (reported once until it recovers)."""
+        try:
+            boxes = self.detector.submit(frame, source=self.camera_index).result()
+        except Exception as e:
+            # Missing weights or a failed inference must not kill the camera thread
+            if not self.detector_failed:
+                print(f"Face detection failed on camera {self.camera_index}: {e}")
+                self.detector_failed = True
+            return None
+        self.detector_failed = False
+        return boxes
+
+    def reset_tracking(self):
+        # Frames were skipped, so flow has nothing to follow from and old tracks are stale
+        self.prev_gray = None
+        self.tracker.clear()
+
+    def get_face_encodings(self, frame, boxes, tracks=None):
+        """Encode all YOLO boxes of a frame in one call, aligned with boxes (None if unusable).
+
+        Faces below the quality gate are skipped, unless their track has gone
+        quality_patience frames without an identity and this is its best sample yet.
+        """
+        if not len(boxes):
+            return []
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = boxes_to_locations(boxes, frame.shape, self.face_box_padding)
+        scores = self.quality_gate.scores(rgb_frame, locations)
+        for i, score in enumerate(scores):
+            if locations[i] is None or score >= self.quality_gate.threshold:
+                continue
+            track = tracks[i] if tracks is not None else None
+            if track is None or track.face_id is not None or track.age < self.quality_patience \
+                    or score < track.best_quality:
+                locations[i] = None
+                self.quality_encodes_skipped += 1
+            if track is not None:
+                track.best_quality = max(track.best_quality, score)
+        return encode_faces(rgb_frame, locations)
 
     def save_face_image(self, face_img, face_id):
-        person_folder = os.path.join(self.face_folder, f'person_{face_id}')
-        face_img_path = os.path.join(person_folder, f'face_{len(os.listdir(person_folder))}.jpg')
-        cv2.imwrite(face_img_path, face_img)
+        # Queued to the background writer; it stops at max_images_per_person
+        return self.face_writer.save(face_img, face_id)
 
     def start_ai_processing(self):
         self.ai_processing = True
@@ -151,6 +263,93 @@ class CameraThread(QtCore.QThread):
     def stop_ai_processing(self):
         self.ai_processing = False
 
+    def pause(self):
+        self._active.clear()
+
+    def resume(self):
+        self._active.set()
+
     def stop(self):
-        self.cap.release()
+        # run() releases the grabber on its way out, within one read timeout
+        self._running = False
+        self._active.set()
         cv2.destroyAllWindows()
+
+
+class ProcessCameraThread(QtCore.QThread):
+    """Displays a camera whose capture, YOLO and encoding run in a worker process.
+
+    Frames, boxes and encodings arrive through a shared-memory ring; this thread
+    only matches encodings against the shared gallery, saves crops and draws.
+    """
+
+    def __init__(self, camera_index, gallery_mode="exact"):
+        super().__init__()
+        self.camera_index = camera_index
+        self.views = ChannelSet()
+        self.camera = CameraProcess(camera_index, YOLO_WEIGHTS)
+        self.face_folder = "detected_faces"
+        self.max_images_per_person = 5
+        self.gallery = get_shared_gallery(self.face_folder, gallery_mode)
+        self.face_writer = get_face_writer(self.face_folder, self.max_images_per_person)
+        self.similarity_threshold = 0.6
+        self._running = True
+        self._active = threading.Event()
+        self._active.set()
+
+    @property
+    def ai_processing(self):
+        return self.camera.ai_enabled.is_set()
+
+    def run(self):
+        try:
+            self.camera.start()
+        except ValueError as e:
+            print(e)
+            return
+        while self._running:
+            if not self._active.is_set():
+                self._active.wait(0.1)
+                continue
+            latest = self.camera.read()
+            if latest is None:
+                if not self.camera.alive:
+                    # read() returns at once for a dead worker; stop rather than spin on it
+                    print(f"Camera worker for {self.camera_index} exited")
+                    break
+                continue
+            frame, boxes, encodings = latest
+
+            matches = self.gallery.match_many(encodings, self.similarity_threshold) if len(boxes) else []
+            face_ids = []
+            for (x1, y1, x2, y2), face_encoding, (matched_id, _) in zip(boxes, encodings, matches):
+                if matched_id is None:
+                    matched_id = self.gallery.add_identity(face_encoding, self.similarity_threshold)
+                self.face_writer.save(frame[max(y1, 0):y2, max(x1, 0):x2], matched_id)
+                face_ids.append(matched_id)
+            for (x1, y1, x2, y2), face_id in zip(boxes, face_ids):
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+                cv2.putText(frame, f'ID: {face_id}', 
+                            (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+
+            self.views.publish(frame)
+        self.camera.stop()
+
+    def start_ai_processing(self):
+        self.camera.ai_enabled.set()
+
+    def stop_ai_processing(self):
+        self.camera.ai_enabled.clear()
+
+    def pause(self):
+        # The worker process idles too, so a hidden camera costs no CPU or GPU time
+        self.camera.paused.set()
+        self._active.clear()
+
+    def resume(self):
+        self.camera.paused.clear()
+        self._active.set()
+
+    def stop(self):
+        self._running = False
+        self._active.set()
@@ -0,0 +1,150 @@
+import os
+import queue
+import re
+import threading
+import time
+import cv2
+
+
+class FaceImageWriter(object):
+    """Saves face crops under face_folder/person_N/ without touching the disk on the capture thread.
+
+    Per-person image counts are read from disk once at startup and kept in
+    memory. JPEG encoding and writes run on a small pool of background threads
+    fed by a bounded queue; when the queue is full new crops are dropped rather
+    than stalling the caller. Workers drain up to batch_size jobs at a time.
+    """
+
+    def __init__(self, face_folder="detected_faces", max_images_per_person=5, workers=2,
+                 max_queue=64, batch_size=8, jpeg_quality=90):
+        self.face_folder = face_folder
+        self.max_images_per_person = max_images_per_person
+        self.batch_size = batch_size
+        self.jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.write_seconds = 0.0
+        self.max_write_seconds = 0.0
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        if not os.path.exists(self.face_folder):
+            os.makedirs(self.face_folder)
+        self._load_counts()
+        self._threads = [threading.Thread(target=self._worker, name=f"face-writer-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _load_counts(self):
+        for name in os.listdir(self.face_folder):
+            match = re.fullmatch(r'person_(\d+)', name)
+            path = os.path.join(self.face_folder, name)
+            if match and os.path.isdir(path):
+                self._counts[int(match.group(1))] = len(os.listdir(path))
+
+    def known_ids(self):
+        """IDs that already have a person_N folder (on disk or queued)."""
+        with self._lock:
+            return list(self._counts)
+
+    def image_count(self, face_id):
+        with self._lock:
+            return self._counts.get(face_id, 0)
+
+    def save(self, face_img, face_id):
+        """Queue a crop for person face_id if they still need images; returns True if queued."""
+        if face_img.size == 0:
+            return False
+        with self._lock:
+            index = self._counts.get(face_id, 0)
+            if index >= self.max_images_per_person:
+                return False
+            self._counts[face_id] = index + 1
+        path = os.path.join(self.face_folder, f'person_{face_id}', f'face_{index}.jpg')
+        try:
+            # Copy: the caller keeps drawing on its frame
+            self._queue.put_nowait((path, face_img.copy()))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                # Give the slot back so a later crop can fill it
+                if self._counts.get(face_id) == index + 1:
+                    self._counts[face_id] = index
+            return False
+        return True
+
+    def _worker(self):
+        while True:
+            jobs = [self._queue.get()]
+            while jobs[-1] is not None and len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for job in jobs:
+                if job is None:
+                    return
+                path, face_img = job
+                start = time.perf_counter()
+                try:
+                    ok, data = cv2.imencode('.jpg', face_img, self.jpeg_params)
+                    if not ok:
+                        raise ValueError(f"Could not encode face image for {path}")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, 'wb') as f:
+                        f.write(data.tobytes())
+                except (OSError, ValueError, cv2.error) as e:
+                    print(f"Failed to save face image: {e}")
+                    with self._lock:
+                        self.failed += 1
+                    continue
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.written += 1
+                    self.write_seconds += elapsed
+                    self.max_write_seconds = max(self.max_write_seconds, elapsed)
+
+    def metrics(self):
+        """Queue depth, written/dropped/failed counts and write latency in ms."""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "mean_write_ms": 1000.0 * self.write_seconds / max(self.written, 1),
+                "max_write_ms": 1000.0 * self.max_write_seconds,
+            }
+
+    def close(self):
+        """Flush queued writes and stop the workers."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_face_writer(face_folder="detected_faces", max_images_per_person=5):
+    """Return the process-wide FaceImageWriter for face_folder, so all cameras share its counts."""
+    key = os.path.abspath(face_folder)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = FaceImageWriter(face_folder, max_images_per_person)
+            _writers[key] = writer
+        return writer
+
+
+def close_all():
+    """Flush and stop every face writer, e.g. when the application exits."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,98 @@
+import threading
+import time
+import cv2
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtGui import QImage
+
+
+def fit_size(frame_shape, size):
+    """Largest (width, height) with the frame's aspect ratio that fits inside size."""
+    h, w = frame_shape[:2]
+    scale = min(size[0] / float(w), size[1] / float(h))
+    return max(int(w * scale), 1), max(int(h * scale), 1)
+
+
+class FrameChannel(QtCore.QObject):
+    """Latest-value delivery of camera frames from a worker thread to one view.
+
+    publish() may be called from any thread. It scales the BGR frame down to
+    the view's display size, converts it to an RGB QImage there, and replaces
+    whatever frame is still waiting, so at most one frame per view is ever
+    pending. frame_ready fires on the GUI thread no faster than max_fps (the
+    screen refresh rate by default). Frames replaced before the GUI took them
+    are counted in dropped.
+    """
+    frame_ready = QtCore.pyqtSignal(QImage)
+    _pending = QtCore.pyqtSignal()
+
+    def __init__(self, size=None, max_fps=None, parent=None):
+        super().__init__(parent)
+        if max_fps is None:
+            screen = QtGui.QGuiApplication.primaryScreen()
+            max_fps = screen.refreshRate() if screen is not None and screen.refreshRate() > 0 else 60.0
+        self.size = size
+        self.interval = 1.0 / max_fps
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._image = None
+        self._scheduled = False
+        self._last_delivery = 0.0
+        self._lock = threading.Lock()
+        self._pending.connect(self._deliver, QtCore.Qt.QueuedConnection)
+
+    def publish(self, frame):
+        """Offer a BGR frame to the view (any thread); replaces a frame still pending."""
+        if self.size is not None:
+            width, height = fit_size(frame.shape, self.size)
+            if (width, height) != (frame.shape[1], frame.shape[0]):
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = rgb.shape
+        # copy() so the image owns its pixels once rgb goes out of scope
+        image = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888).copy()
+        with self._lock:
+            self.published += 1
+            if self._image is not None:
+                self.dropped += 1
+            self._image = image
+            scheduled, self._scheduled = self._scheduled, True
+        if not scheduled:
+            self._pending.emit()
+
+    def _deliver(self):
+        wait = self.interval - (time.monotonic() - self._last_delivery)
+        if wait > 0:
+            QtCore.QTimer.singleShot(int(wait * 1000) + 1, self._deliver)
+            return
+        with self._lock:
+            image, self._image = self._image, None
+            self._scheduled = False
+        if image is not None:
+            self._last_delivery = time.monotonic()
+            self.delivered += 1
+            self.frame_ready.emit(image)
+
+    def stats(self):
+        """Frames offered, shown and dropped for this view."""
+        return {"published": self.published, "delivered": self.delivered, "dropped": self.dropped}
+
+
+class ChannelSet(object):
+    """The views a camera thread currently publishes to; safe to change while it runs."""
+
+    def __init__(self):
+        self._channels = ()
+
+    def add(self, channel):
+        self._channels = self._channels + (channel,)
+
+    def remove(self, channel):
+        self._channels = tuple(c for c in self._channels if c is not channel)
+
+    def publish(self, frame):
+        for channel in self._channels:
+            channel.publish(frame)
+
+    def __len__(self):
+        return len(self._channels)
@@ -0,0 +1,133 @@
+import time
+import numpy as np
+
+
+class FaceGallery(object):
+    """Known face encodings kept as one contiguous float32 matrix with a parallel ID array."""
+
+    def __init__(self, dim=128, capacity=1024):
+        self.dim = dim
+        self.size = 0
+        self._encodings = np.empty((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def encodings(self):
+        return self._encodings[:self.size]
+
+    @property
+    def ids(self):
+        return self._ids[:self.size]
+
+    def add(self, face_id, encoding):
+        """Append one encoding under the given ID, growing the buffers when full."""
+        if self.size == len(self._ids):
+            self._grow(max(2 * len(self._ids), 1))
+        row = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        self._encodings[self.size] = row
+        self._sq_norms[self.size] = np.dot(row, row)
+        self._ids[self.size] = face_id
+        self.size += 1
+
+    def add_many(self, face_ids, encodings):
+        """Append many encodings at once (e.g. when loading a saved gallery)."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        n = len(encodings)
+        if self.size + n > len(self._ids):
+            self._grow(max(2 * len(self._ids), self.size + n))
+        self._encodings[self.size:self.size + n] = encodings
+        self._sq_norms[self.size:self.size + n] = np.einsum('ij,ij->i', encodings, encodings)
+        self._ids[self.size:self.size + n] = face_ids
+        self.size += n
+
+    def _grow(self, capacity):
+        encodings = np.empty((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        ids = np.empty(capacity, dtype=np.int64)
+        encodings[:self.size] = self._encodings[:self.size]
+        sq_norms[:self.size] = self._sq_norms[:self.size]
+        ids[:self.size] = self._ids[:self.size]
+        self._encodings, self._sq_norms, self._ids = encodings, sq_norms, ids
+
+    def snapshot(self):
+        """(ids, encodings, squared norms) views of the rows present right now.
+
+        Rows are only ever appended and size is bumped after a row is written,
+        so a snapshot stays consistent while another thread keeps adding.
+        """
+        size = self.size
+        return self._ids[:size], self._encodings[:size], self._sq_norms[:size]
+
+    def distances(self, queries, snapshot=None):
+        """Euclidean distance from every query row to every gallery row, shape (n_queries, size)."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        _, gallery, sq_norms = snapshot if snapshot is not None else self.snapshot()
+        # |q - g|^2 = |q|^2 - 2 q.g + |g|^2, computed as one matrix product
+        sq = np.einsum('ij,ij->i', queries, queries)[:, None] - 2.0 * (queries @ gallery.T)
+        sq += sq_norms[None, :]
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def match_many(self, queries, tolerance=0.6):
+        """Return a (face_id or None, distance) pair for each query encoding."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        snapshot = self.snapshot()
+        ids = snapshot[0]
+        if len(ids) == 0:
+            return [(None, float('inf'))] * len(queries)
+        dist = self.distances(queries, snapshot)
+        best = np.argmin(dist, axis=1)
+        best_dist = dist[np.arange(len(queries)), best]
+        matches = []
+        for row, d in zip(best, best_dist):
+            face_id = int(ids[row]) if d <= tolerance else None
+            matches.append((face_id, float(d)))
+        return matches
+
+    def match(self, encoding, tolerance=0.6):
+        """Return (face_id or None, distance) for the closest known face."""
+        return self.match_many(encoding, tolerance)[0]
+
+
+def benchmark(sizes=(100, 10000, 100000), n_queries=20, tolerance=0.6):
+    """Compare the per-ID compare_faces loop against the batched gallery match."""
+    import face_recognition
+
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        known = rng.normal(0.0, 0.1, (size, 128)).astype(np.float32)
+        queries = known[rng.integers(0, size, n_queries)] + rng.normal(0.0, 0.01, (n_queries, 128)).astype(np.float32)
+        face_encodings = {face_id: known[face_id].astype(np.float64) for face_id in range(size)}
+
+        gallery = FaceGallery(capacity=size)
+        for face_id in range(size):
+            gallery.add(face_id, known[face_id])
+
+        # The old loop is slow at scale, so only time a few of its queries
+        loop_queries = queries[:max(1, min(n_queries, 1000000 // (size * 50)))]
+        start = time.perf_counter()
+        for query in loop_queries:
+            for face_id, encoding in face_encodings.items():
+                if face_recognition.compare_faces([encoding], query, tolerance=tolerance)[0]:
+                    break
+        loop_ms = (time.perf_counter() - start) * 1000.0 / len(loop_queries)
+
+        start = time.perf_counter()
+        for query in queries:
+            gallery.match(query, tolerance)
+        single_ms = (time.perf_counter() - start) * 1000.0 / n_queries
+
+        start = time.perf_counter()
+        gallery.match_many(queries, tolerance)
+        batch_ms = (time.perf_counter() - start) * 1000.0 / n_queries
+
+        print(f"{size:>7} identities: loop {loop_ms:9.3f} ms/face | "
+              f"match {single_ms:7.3f} ms/face | match_many {batch_ms:7.3f} ms/face")
+
+
+if __name__ == "__main__":
+    benchmark()
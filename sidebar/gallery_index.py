@@ -0,0 +1,279 @@
+import threading
+import time
+import numpy as np
+from gallery import FaceGallery
+
+
+def _sq_distances(queries, points):
+    """Squared Euclidean distances between two sets of rows."""
+    sq = np.einsum('ij,ij->i', queries, queries)[:, None] - 2.0 * (queries @ points.T)
+    sq += np.einsum('ij,ij->i', points, points)[None, :]
+    return np.maximum(sq, 0.0, out=sq)
+
+
+def _top_k(dist, ids, k):
+    """Pick the k smallest entries of each row, sorted, padding with -1 / inf."""
+    n, m = dist.shape
+    out_ids = np.full((n, k), -1, dtype=np.int64)
+    out_dist = np.full((n, k), np.inf, dtype=np.float32)
+    kk = min(k, m)
+    if kk == 0:
+        return out_ids, out_dist
+    part = np.argpartition(dist, kk - 1, axis=1)[:, :kk] if kk < m else np.tile(np.arange(m), (n, 1))
+    part_dist = np.take_along_axis(dist, part, axis=1)
+    order = np.argsort(part_dist, axis=1)
+    part = np.take_along_axis(part, order, axis=1)
+    out_ids[:, :kk] = ids[part]
+    out_dist[:, :kk] = np.take_along_axis(part_dist, order, axis=1)
+    return out_ids, out_dist
+
+
+def _assign(data, centroids, chunk=65536):
+    """Nearest centroid for every row, computed in chunks to bound memory."""
+    return np.concatenate([np.argmin(_sq_distances(data[i:i + chunk], centroids), axis=1)
+                           for i in range(0, len(data), chunk)])
+
+
+def _kmeans(data, n_clusters, iterations=10, max_points_per_cluster=64, seed=0):
+    rng = np.random.default_rng(seed)
+    # Train on a sample; the centroids barely move with more points
+    if len(data) > n_clusters * max_points_per_cluster:
+        data = data[rng.choice(len(data), n_clusters * max_points_per_cluster, replace=False)]
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _assign(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=n_clusters)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points so every list stays useful
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class ExactIndex(FaceGallery):
+    """Brute-force index: every query is scanned against the whole gallery."""
+
+    def search(self, queries, k=1, exact=True):
+        """Return (ids, distances), each of shape (n_queries, k), nearest first."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        snapshot = self.snapshot()
+        return _top_k(self.distances(queries, snapshot), snapshot[0], k)
+
+
+class IVFIndex(object):
+    """Inverted-file index: k-means cells, each query only scans the nprobe closest cells.
+
+    Until train_size encodings have been inserted the index behaves exactly like
+    ExactIndex. After that it clusters what it has into nlist cells and keeps
+    assigning new encodings to the nearest cell. It re-clusters whenever the
+    gallery has grown retrain_factor times since the last training.
+
+    Training runs on a background thread, so an insert never waits for k-means:
+    new encodings keep going to the old cells (or only the flat index) until the
+    new cells are swapped in with one assignment. With a single writer, searches
+    need no lock, since every cell is append-only.
+    """
+
+    def __init__(self, dim=128, nlist=256, nprobe=8, train_size=None, retrain_factor=4):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size if train_size is not None else 16 * nlist
+        self.retrain_factor = retrain_factor
+        self._cells = (None, [])  # (centroids, inverted lists), swapped as one
+        self._trained_at = 0
+        self._flat = ExactIndex(dim)
+        self._lock = threading.Lock()  # Orders cell inserts against the swap
+        self._trainer = None
+
+    def __len__(self):
+        return len(self._flat)
+
+    @property
+    def centroids(self):
+        return self._cells[0]
+
+    @property
+    def lists(self):
+        return self._cells[1]
+
+    @property
+    def training(self):
+        return self._trainer is not None and self._trainer.is_alive()
+
+    def add(self, face_id, encoding):
+        """Insert one encoding; starts a background (re-)training when due."""
+        row = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            self._flat.add(face_id, row)
+            centroids, lists = self._cells
+            if centroids is not None:
+                cell = int(np.argmin(_sq_distances(row[None, :], centroids)[0]))
+                lists[cell].add(face_id, row)
+        self._train_if_due()
+
+    def add_many(self, face_ids, encodings):
+        """Insert many encodings at once, then start a background training if due."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._flat.add_many(face_ids, encodings)
+            centroids, lists = self._cells
+            if centroids is not None and len(encodings):
+                cells = _assign(encodings, centroids)
+                for face_id, row, cell in zip(face_ids, encodings, cells):
+                    lists[cell].add(face_id, row)
+        self._train_if_due()
+
+    def _train_if_due(self):
+        size = len(self._flat)
+        due = self.train_size if self._cells[0] is None else self._trained_at * self.retrain_factor
+        if size >= due and not self.training:
+            self.train(background=True)
+
+    def train(self, background=False):
+        """Cluster every stored encoding and rebuild the inverted lists.
+
+        With background=True the clustering runs on a daemon thread and this
+        returns at once; wait() blocks until the new cells are in place.
+        """
+        if not background:
+            self._build()
+            return
+        self._trainer = threading.Thread(target=self._build, name="ivf-train", daemon=True)
+        self._trainer.start()
+
+    def wait(self):
+        """Block until a background training in progress has been swapped in."""
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join()
+
+    def _build(self):
+        ids, data, _ = self._flat.snapshot()
+        trained = len(data)
+        n_clusters = min(self.nlist, trained)
+        centroids = _kmeans(data, n_clusters)
+        assign = _assign(data, centroids)
+        lists = []
+        for cell in range(n_clusters):
+            members = np.flatnonzero(assign == cell)
+            gallery = FaceGallery(self.dim, capacity=max(len(members), 16))
+            gallery.add_many(ids[members], data[members])
+            lists.append(gallery)
+        # Encodings inserted while clustering only reached the old cells; add them to the new ones,
+        # most of them outside the lock and only the last few under it, right before the swap
+        done = self._catch_up(lists, centroids, trained)
+        with self._lock:
+            self._catch_up(lists, centroids, done)
+            self._cells = (centroids, lists)
+            self._trained_at = trained
+
+    def _catch_up(self, lists, centroids, start):
+        ids, data, _ = self._flat.snapshot()
+        if len(data) > start:
+            for face_id, row, cell in zip(ids[start:], data[start:], _assign(data[start:], centroids)):
+                lists[cell].add(face_id, row)
+        return len(data)
+
+    def search(self, queries, k=1, exact=False):
+        """Return (ids, distances) of shape (n_queries, k); exact=True scans everything."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        centroids, lists = self._cells
+        if exact or centroids is None:
+            return self._flat.search(queries, k)
+        nprobe = min(self.nprobe, len(centroids))
+        cell_dist = _sq_distances(queries, centroids)
+        probes = np.argpartition(cell_dist, nprobe - 1, axis=1)[:, :nprobe]
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        out_dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for q, cells in enumerate(probes):
+            snapshots = [(lists[c], lists[c].snapshot()) for c in cells]
+            snapshots = [(cell, snapshot) for cell, snapshot in snapshots if len(snapshot[0])]
+            if not snapshots:
+                continue
+            dist = np.concatenate([cell.distances(queries[q], snapshot) for cell, snapshot in snapshots], axis=1)
+            ids = np.concatenate([snapshot[0] for _, snapshot in snapshots])
+            q_ids, q_dist = _top_k(dist, ids, k)
+            out_ids[q], out_dist[q] = q_ids[0], q_dist[0]
+        return out_ids, out_dist
+
+    def match_many(self, queries, tolerance=0.6):
+        """Return a (face_id or None, distance) pair for each query encoding."""
+        ids, dist = self.search(queries, 1)
+        return [(int(i) if d <= tolerance else None, float(d)) for i, d in zip(ids[:, 0], dist[:, 0])]
+
+    def match(self, encoding, tolerance=0.6):
+        """Return (face_id or None, distance) for the closest known face."""
+        return self.match_many(encoding, tolerance)[0]
+
+
+INDEX_TYPES = {"exact": ExactIndex, "ivf": IVFIndex}
+
+
+def create_index(mode="exact", **kwargs):
+    """Build a gallery index by name ('exact' or 'ivf')."""
+    if mode not in INDEX_TYPES:
+        raise ValueError(f"Unknown gallery index mode: {mode}")
+    return INDEX_TYPES[mode](**kwargs)
+
+
+def recall_report(index, queries, k=1, exact_index=None):
+    """Measure recall@k and per-query latency of index against a brute-force scan.
+
+    exact_index defaults to the index's own exact mode. Returns a dict with the
+    recall, the mean/p50/p99 latency of the index and the mean exact latency (ms).
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, index.dim)
+
+    def timed(search):
+        ids, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            q_ids, _ = search(query)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            ids.append(q_ids[0])
+        return np.array(ids), np.array(latencies)
+
+    if exact_index is None:
+        truth, exact_ms = timed(lambda q: index.search(q, k, exact=True))
+    else:
+        truth, exact_ms = timed(lambda q: exact_index.search(q, k))
+    found, approx_ms = timed(lambda q: index.search(q, k))
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    total = max(int((truth >= 0).sum()), 1)
+    return {
+        "recall": hits / total,
+        "mean_ms": float(approx_ms.mean()),
+        "p50_ms": float(np.percentile(approx_ms, 50)),
+        "p99_ms": float(np.percentile(approx_ms, 99)),
+        "exact_mean_ms": float(exact_ms.mean()),
+    }
+
+
+def benchmark(size=200000, nlist=1024, nprobes=(1, 2, 4, 8, 16, 32), n_queries=200, k=10):
+    """Sweep nprobe on a synthetic clustered gallery and print recall vs latency."""
+    rng = np.random.default_rng(0)
+    people = rng.normal(0.0, 0.1, (size // 4, 128)).astype(np.float32)
+    data = people[rng.integers(0, len(people), size)] + rng.normal(0.0, 0.02, (size, 128)).astype(np.float32)
+    queries = data[rng.integers(0, size, n_queries)] + rng.normal(0.0, 0.02, (n_queries, 128)).astype(np.float32)
+
+    index = IVFIndex(nlist=nlist, train_size=size)
+    start = time.perf_counter()
+    for face_id, row in enumerate(data):
+        index.add(face_id, row)
+    index.wait()
+    print(f"inserted {size} encodings in {time.perf_counter() - start:.1f} s")
+
+    for nprobe in nprobes:
+        index.nprobe = nprobe
+        report = recall_report(index, queries, k)
+        print(f"nprobe {nprobe:>3}: recall@{k} {report['recall']:.3f} | "
+              f"mean {report['mean_ms']:.3f} ms p50 {report['p50_ms']:.3f} ms p99 {report['p99_ms']:.3f} ms | "
+              f"exact {report['exact_mean_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
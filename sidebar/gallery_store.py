@@ -0,0 +1,239 @@
+import os
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+_MAGIC = b"EOSGAL01"
+# magic, dim, count, next_id, last_seq
+_HEADER = struct.Struct("<8sIQqQ")
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _record_dtype(dim):
+    return np.dtype([("seq", "<u8"), ("id", "<i8"), ("encoding", "<f4", (dim,)), ("crc", "<u4")])
+
+
+def _fsync_dir(path):
+    # Make the rename itself durable; not possible on Windows, where it is skipped
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class GalleryStore(object):
+    """On-disk face gallery: a memory-mappable snapshot plus an append-only log.
+
+    gallery.bin holds a fixed header followed by the int64 IDs and the float32
+    encoding matrix, so loading is one memory map. It is only ever replaced
+    atomically (write to a temp file, fsync, rename). Every new identity is
+    appended to gallery.log as a fixed-size record with a sequence number and a
+    CRC; on load, a torn or corrupt tail left by a crash is cut off, and records
+    already folded into the snapshot (seq <= the snapshot's last_seq) are skipped.
+    """
+
+    def __init__(self, folder, dim=128, compact_every=4096, fsync=False):
+        self.folder = folder
+        self.dim = dim
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.snapshot_path = os.path.join(folder, "gallery.bin")
+        self.log_path = os.path.join(folder, "gallery.log")
+        self.next_id = 0
+        self.last_seq = 0
+        self.log_records = 0
+        self._record = _record_dtype(dim)
+        self._lock = threading.Lock()
+        self._log = None
+        self._compactor = None
+        os.makedirs(folder, exist_ok=True)
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32), 0, 0
+        with open(self.snapshot_path, "rb") as f:
+            magic, dim, count, next_id, last_seq = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or dim != self.dim:
+            raise ValueError(f"Not a {self.dim}-d gallery snapshot: {self.snapshot_path}")
+        if count == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32), next_id, last_seq
+        ids = np.memmap(self.snapshot_path, dtype="<i8", mode="r", offset=_HEADER.size, shape=(count,))
+        encodings = np.memmap(self.snapshot_path, dtype="<f4", mode="r",
+                              offset=_HEADER.size + 8 * count, shape=(count, self.dim))
+        return ids, encodings, next_id, last_seq
+
+    def _valid_records(self, raw):
+        # Records up to the first torn or corrupt one
+        n = len(raw) // self._record.itemsize
+        records = raw[:n * self._record.itemsize].view(self._record)
+        body = self._record.itemsize - 4
+        for i in range(n):
+            start = i * self._record.itemsize
+            if zlib.crc32(raw[start:start + body]) != records["crc"][i]:
+                return records[:i]
+        return records
+
+    def _read_log(self, last_seq):
+        if not os.path.exists(self.log_path):
+            return np.empty(0, dtype=self._record)
+        raw = np.fromfile(self.log_path, dtype=np.uint8)
+        records = self._valid_records(raw)
+        valid = len(records)
+        if valid * self._record.itemsize != len(raw):
+            # Drop the torn/corrupt tail so future appends start on a record boundary
+            print(f"Gallery log truncated to {valid} of {len(raw) // self._record.itemsize} records "
+                  f"after an unclean shutdown")
+            with open(self.log_path, "r+b") as f:
+                f.truncate(valid * self._record.itemsize)
+        return records[records["seq"] > last_seq]
+
+    def load(self):
+        """Return (ids, encodings, next_id) for everything ever saved."""
+        with self._lock:
+            ids, encodings, next_id, last_seq = self._read_snapshot()
+            records = self._read_log(last_seq)
+            self.log_records = len(records)
+            if len(records):
+                ids = np.concatenate([ids, records["id"]])
+                encodings = np.concatenate([encodings, records["encoding"]])
+                next_id = max(next_id, int(records["id"].max()) + 1)
+                last_seq = int(records["seq"].max())
+            self.next_id = next_id
+            self.last_seq = last_seq
+            return ids, encodings, next_id
+
+    def append(self, face_id, encoding):
+        """Durably record one new identity; compacts the log in the background when it grows large."""
+        with self._lock:
+            record = np.zeros(1, dtype=self._record)
+            record["seq"] = self.last_seq + 1
+            record["id"] = face_id
+            record["encoding"] = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+            raw = record.tobytes()
+            record["crc"] = zlib.crc32(raw[:-4])
+            if self._log is None:
+                self._log = open(self.log_path, "ab")
+            self._log.write(record.tobytes())
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self.last_seq += 1
+            self.log_records += 1
+            self.next_id = max(self.next_id, int(face_id) + 1)
+            if self.compact_every and self.log_records >= self.compact_every \
+                    and (self._compactor is None or not self._compactor.is_alive()):
+                # Rewriting the snapshot takes a while; the caller is a camera thread
+                self._compactor = threading.Thread(target=self.compact, name="gallery-compact", daemon=True)
+                self._compactor.start()
+
+    def _write_snapshot(self, ids, encodings, next_id, last_seq):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.dim, len(ids), next_id, last_seq))
+            f.write(np.ascontiguousarray(ids, dtype="<i8").tobytes())
+            f.write(np.ascontiguousarray(encodings, dtype="<f4").tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(self.folder)
+
+    def compact(self):
+        """Fold the log into a fresh snapshot and empty the log.
+
+        Appends keep going meanwhile: the snapshot is built from the log as it
+        was when compaction started, and only the lock-held final step moves
+        records appended since then into a fresh log. A crash in between is
+        harmless, since log records covered by the snapshot's last_seq are
+        skipped on load.
+        """
+        with self._lock:
+            if self._log is not None:
+                self._log.flush()
+            upto, next_id = self.last_seq, self.next_id
+            log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+
+        ids, encodings, _, snapshot_seq = self._read_snapshot()
+        with open(self.log_path, "rb") as f:
+            raw = np.frombuffer(f.read(log_size), dtype=np.uint8) if log_size else np.empty(0, dtype=np.uint8)
+        records = self._valid_records(raw)
+        records = records[(records["seq"] > snapshot_seq) & (records["seq"] <= upto)]
+        # Copies, so no map of the old snapshot is open while it is replaced
+        ids = np.concatenate([np.array(ids), records["id"]])
+        encodings = np.concatenate([np.array(encodings), records["encoding"]])
+        self._write_snapshot(ids, encodings, next_id, upto)
+
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            with open(self.log_path, "rb") as f:
+                f.seek(log_size)
+                tail = f.read()
+            tmp_path = self.log_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.log_path)
+            self.log_records = len(tail) // self._record.itemsize
+
+    def close(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def open_store(folder, dim=128):
+    """Return the process-wide GalleryStore for folder so only one writer appends to its log."""
+    key = os.path.abspath(folder)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = GalleryStore(folder, dim)
+            _stores[key] = store
+        return store
+
+
+def close_all():
+    """Finish any compaction and close every store's log, e.g. when the application exits."""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+
+def benchmark(folder="gallery_bench", size=300000, log_size=2000):
+    """Write a synthetic snapshot plus log, then time a cold load into a FaceGallery."""
+    from gallery import FaceGallery
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(0.0, 0.1, (size + log_size, 128)).astype(np.float32)
+    store = GalleryStore(folder, compact_every=0)
+    store._write_snapshot(np.arange(size), data[:size], size, 0)
+    open(store.log_path, "wb").close()
+    for face_id in range(size, size + log_size):
+        store.append(face_id, data[face_id])
+    store.close()
+
+    start = time.perf_counter()
+    ids, encodings, next_id = GalleryStore(folder).load()
+    load_ms = (time.perf_counter() - start) * 1000.0
+    gallery = FaceGallery(capacity=len(ids))
+    gallery.add_many(ids, encodings)
+    total_ms = (time.perf_counter() - start) * 1000.0
+    print(f"{len(ids)} encodings (next_id {next_id}): loaded in {load_ms:.1f} ms, "
+          f"in a FaceGallery after {total_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
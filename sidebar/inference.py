@@ -0,0 +1,173 @@
+import collections
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+class DetectorService(object):
+    """Owns one loaded YOLO model and batches detections from every camera.
+
+    Callers submit frames and get a Future back that resolves to an (N, 4) int
+    array of [x1, y1, x2, y2] boxes. A single worker thread collects the latest
+    pending frame of each source, waits at most max_wait seconds for up to
+    max_batch of them, runs one batched forward pass and routes each result back.
+    The model is loaded on the worker thread, so neither the GUI thread nor the
+    camera threads pay for it.
+    """
+
+    def __init__(self, weights_path, max_batch=8, max_wait=0.005):
+        self.weights_path = weights_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.model = None
+        self.frames_processed = 0
+        self.batches_run = 0
+        self.frames_superseded = 0
+        self._pending = collections.OrderedDict()  # source -> (frame, future)
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._worker, name="yolo", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        if self.model is None:
+            from ultralytics import YOLO
+            self.model = YOLO(self.weights_path)
+        return self.model
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if not self._pending:
+                return []
+            # Give the other cameras a short window to join this batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popitem(last=False)[1])
+            return batch
+
+    def _worker(self):
+        load_error = None
+        try:
+            self._load()
+        except Exception as e:
+            load_error = e
+        while True:
+            batch = [(frame, future) for frame, future in self._next_batch() if future.set_running_or_notify_cancel()]
+            if not batch:
+                if self._stopped:
+                    return
+                continue
+            try:
+                if load_error is not None:
+                    raise load_error
+                results = self.model([frame for frame, _ in batch], verbose=False)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result.boxes.xyxy.cpu().numpy().astype(int).reshape(-1, 4))
+            self.frames_processed += len(batch)
+            self.batches_run += 1
+
+    def submit(self, frame, source=None):
+        """Queue a BGR frame for detection; returns a Future of the boxes.
+
+        Frames from the same source coalesce: if an older frame from that source
+        is still waiting, it is cancelled and replaced by the new one.
+        """
+        future = Future()
+        key = source if source is not None else object()
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Detector service has been shut down")
+            stale = self._pending.pop(key, None)
+            self._pending[key] = (frame, future)
+            self._cond.notify()
+        if stale is not None and stale[1].cancel():
+            self.frames_superseded += 1
+        return future
+
+    def detect(self, frame, source=None):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(frame, source).result()
+
+    def stats(self):
+        """Frames processed, batches run, mean batch size and superseded frames."""
+        return {
+            "frames": self.frames_processed,
+            "batches": self.batches_run,
+            "mean_batch": self.frames_processed / max(self.batches_run, 1),
+            "superseded": self.frames_superseded,
+        }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+def get_detector(weights_path, max_batch=8, max_wait=0.005):
+    """Return the process-wide DetectorService for weights_path, creating it once.
+
+    max_batch and max_wait only apply when the service is first created.
+    """
+    with _services_lock:
+        service = _services.get(weights_path)
+        if service is None:
+            service = DetectorService(weights_path, max_batch, max_wait)
+            _services[weights_path] = service
+        return service
+
+
+def shutdown_all():
+    """Stop every detector service, e.g. when the application exits."""
+    with _services_lock:
+        services = list(_services.values())
+        _services.clear()
+    for service in services:
+        service.shutdown()
+
+
+def benchmark(weights_path="yolov8n.pt", cameras=(1, 4, 8, 16), batch_sizes=(1, 8, 16), seconds=10.0):
+    """Simulated cameras hammering one service; prints total detections per second."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    for max_batch in batch_sizes:
+        for n_cameras in cameras:
+            service = DetectorService(weights_path, max_batch=max_batch)
+            service.detect(frame)  # warm up
+            stop = time.monotonic() + seconds
+            counts = [0] * n_cameras
+
+            def camera(index):
+                while time.monotonic() < stop:
+                    service.detect(frame, source=index)
+                    counts[index] += 1
+
+            threads = [threading.Thread(target=camera, args=(i,)) for i in range(n_cameras)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            service.shutdown()
+            print(f"max_batch {max_batch:>2}, {n_cameras:>2} cameras: {sum(counts) / seconds:7.1f} frames/s "
+                  f"(mean batch {service.stats()['mean_batch']:.1f})")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(*sys.argv[1:2])
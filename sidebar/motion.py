@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+
+
+class MotionGate(object):
+    """Cheap change detector that decides whether a frame is worth running the detector on.
+
+    Frames are shrunk to a small grayscale copy and compared against a running
+    average background. A frame passes when more than min_area of its pixels
+    differ by over pixel_threshold grey levels; check() also returns the bounding
+    box of the changed pixels in full-resolution coordinates.
+    """
+
+    def __init__(self, pixel_threshold=25, min_area=0.002, width=160, learning_rate=0.05, warmup_frames=5):
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.width = width
+        self.learning_rate = learning_rate
+        self.warmup_frames = warmup_frames
+        self.frames_checked = 0
+        self.frames_gated = 0
+        self._background = None
+        self._seen = 0
+
+    def check(self, frame):
+        """Return (changed, region) where region is [x1, y1, x2, y2] or None."""
+        h, w = frame.shape[:2]
+        scale = self.width / float(w)
+        small = cv2.resize(frame, (self.width, max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        self.frames_checked += 1
+        self._seen += 1
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            return True, None
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        if self._seen <= self.warmup_frames:
+            return True, None
+
+        mask = diff > self.pixel_threshold
+        if mask.mean() < self.min_area:
+            self.frames_gated += 1
+            return False, None
+        ys, xs = np.nonzero(mask)
+        region = np.array([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1], dtype=np.float32) / scale
+        return True, region.astype(int)
+
+    def stats(self):
+        """Frames checked, frames gated out and the share of detector runs saved."""
+        return {
+            "checked": self.frames_checked,
+            "gated": self.frames_gated,
+            "saved": self.frames_gated / max(self.frames_checked, 1),
+        }
+
+
+def expand_region(region, boxes, frame_shape, padding=0.25):
+    """Grow region to cover the given boxes plus padding, clipped to the frame."""
+    h, w = frame_shape[:2]
+    boxes = [np.asarray(box) for box in boxes]
+    if region is not None:
+        boxes.append(np.asarray(region))
+    if not boxes:
+        return None
+    boxes = np.array(boxes, dtype=np.float32)
+    x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+    x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    return np.array([max(x1 - pad_x, 0), max(y1 - pad_y, 0), min(x2 + pad_x, w), min(y2 + pad_y, h)]).astype(int)
@@ -6,11 +6,15 @@ import face_recognition
 import numpy as np
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import QThread, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap
 from datetime import datetime
+import time
+from capture import FrameGrabber
+from faces import detect_faces, detection_scale_for, FaceQualityGate
+from tracking import FlowPropagator, DetectionCadence
+from frame_channel import FrameChannel
+from video_view import VideoView
 
 class FaceRecognitionThread(QThread):
-    change_pixmap_signal = pyqtSignal(QPixmap)
     detection_signal = pyqtSignal(str)
 
     def __init__(self, image_path, person_name):
@@ -24,28 +28,62 @@ class FaceRecognitionThread(QThread):
         self.target_encoding = self.target_encodings[0]
 
         self.camera_index = 0  # Adjust this index if needed
-        self.cap = cv2.VideoCapture(self.camera_index)
+        self.cap = FrameGrabber(self.camera_index)  # Always hands out the newest frame
         if not self.cap.isOpened():
+            self.cap.release()
             raise ValueError(f"Unable to open camera feed with index: {self.camera_index}")
 
+        # Frames above 720p are detected on a downscaled copy; set detection_scale to fix the
+        # scale, or min_face_size (px) to pick the smallest scale that still finds such faces
+        self.detection_scale = None
+        self.min_face_size = None
+        self.quality_gate = FaceQualityGate()
+
+        # Run the HOG detector every few frames and track the faces in between
+        self.cadence = DetectionCadence(every=5, target_fps=15)
+        self.propagator = FlowPropagator()
+        self.prev_gray = None
+        self.track_confidence = 1.0
+        self.face_boxes = []
+        self.frames = FrameChannel()  # Newest frame only; the view scales it on the GPU
+
     def run(self):
         while True:
             ret, frame = self.cap.read()
             if not ret:
-                print("Failed to capture image from camera.")
+                print(f"Failed to capture image from camera ({self.cap.health()['state']}).")
                 continue
 
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
+            started = time.perf_counter()
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             detected = False
-            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                face_distances = face_recognition.face_distance([self.target_encoding], face_encoding)
-                if face_distances[0] < 0.6:
-                    detected = True
-                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                    break
+            run_detector = self.prev_gray is None or self.cadence.should_detect(self.track_confidence)
+            if run_detector:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                face_locations = detect_faces(rgb_frame, detection_scale_for(
+                    rgb_frame.shape, self.detection_scale, self.min_face_size))
+                # Only faces good enough to give a useful embedding go to the encoder
+                good_locations = [location for location in self.quality_gate.filter(rgb_frame, face_locations) if location]
+                face_encodings = face_recognition.face_encodings(rgb_frame, good_locations)
+                self.face_boxes = [(left, top, right, bottom) for (top, right, bottom, left) in face_locations]
+                self.track_confidence = 1.0
+
+                for (top, right, bottom, left), face_encoding in zip(good_locations, face_encodings):
+                    face_distances = face_recognition.face_distance([self.target_encoding], face_encoding)
+                    if face_distances[0] < 0.6:
+                        detected = True
+                        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                        break
+            else:
+                # Between detector runs, follow the faces with optical flow so the boxes stay drawn
+                self.face_boxes, confidences = self.propagator.propagate(self.prev_gray, gray, self.face_boxes)
+                self.track_confidence = min(confidences, default=1.0)
+            self.prev_gray = gray
+            self.cadence.record(run_detector, time.perf_counter() - started)
+
+            if not detected:
+                for left, top, right, bottom in self.face_boxes:
+                    cv2.rectangle(frame, (int(left), int(top)), (int(right), int(bottom)), (255, 0, 0), 2)
 
             if detected:
                 self.cap.release()
@@ -54,11 +92,7 @@ class FaceRecognitionThread(QThread):
                 self.detection_signal.emit(f"{self.person_name} detected")
                 break
 
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
-            qt_img = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.change_pixmap_signal.emit(QPixmap.fromImage(qt_img))
+            self.frames.publish(frame)
 
         self.cap.release()
         cv2.destroyAllWindows()
@@ -79,12 +113,10 @@ class Ui_SearchApp(object):
         self.verticalLayout = QtWidgets.QVBoxLayout(SearchApp)
         SearchApp.setLayout(self.verticalLayout)
         
-        self.image_label = QtWidgets.QLabel(SearchApp)
+        self.image_label = VideoView(SearchApp, background=QtGui.QColor(255, 255, 255), border="black")
         self.image_label.setObjectName("image_label")
-        self.image_label.setText("No image uploaded")
-        self.image_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.image_label.set_text("No image uploaded")
         self.image_label.setFixedSize(800, 600)  # Set to size of camera feed
-        self.image_label.setStyleSheet("border: 1px solid black;")
         self.verticalLayout.addWidget(self.image_label)
         
         self.upload_button = QtWidgets.QPushButton(SearchApp)
@@ -137,8 +169,7 @@ class Ui_SearchApp(object):
         
         if file_path:
             self.image_path = file_path
-            pixmap = QtGui.QPixmap(file_path)
-            self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
+            self.image_label.set_image(QtGui.QImage(file_path))
 
             file_name = os.path.basename(file_path)
             target_path = os.path.join(self.target_folder, file_name)
@@ -147,7 +178,7 @@ class Ui_SearchApp(object):
             self.upload_button.setEnabled(False)
             self.search_button.setEnabled(True)
         else:
-            self.image_label.setText("No image uploaded")
+            self.image_label.set_text("No image uploaded")
 
     def start_search(self):
         """Start the image search in the camera feed."""
@@ -163,12 +194,12 @@ class Ui_SearchApp(object):
         QtWidgets.QMessageBox.information(None, "Search Started", "Searching for the image in the camera feed...")
 
         self.face_recognition_thread = FaceRecognitionThread(self.image_path, self.person_name)
-        self.face_recognition_thread.change_pixmap_signal.connect(self.update_image_label)
+        self.face_recognition_thread.frames.frame_ready.connect(self.update_image_label)
         self.face_recognition_thread.detection_signal.connect(self.show_detection_message)
         self.face_recognition_thread.start()
 
-    def update_image_label(self, pixmap):
-        self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
+    def update_image_label(self, qt_img):
+        self.image_label.set_image(qt_img)
 
     def show_detection_message(self, message):
         QtWidgets.QMessageBox.information(None, "Detection", message)
@@ -0,0 +1,65 @@
+import os
+import threading
+from face_store import get_face_writer
+from gallery_index import create_index
+from gallery_store import open_store
+
+_galleries = {}
+_galleries_lock = threading.Lock()
+
+
+class SharedGallery(object):
+    """The one face gallery every camera thread matches against and adds to.
+
+    Matching takes no lock: the index is append-only and readers work on
+    consistent snapshots of it. Inserts are serialized by a lock, and an insert
+    first re-checks the gallery so two cameras seeing the same new person at
+    the same moment end up with one ID.
+    """
+
+    def __init__(self, face_folder="detected_faces", mode="exact"):
+        self.face_folder = face_folder
+        self.index = create_index(mode)
+        self.store = open_store(os.path.join(face_folder, "gallery"))
+        self._insert_lock = threading.Lock()
+
+        # Restore every identity seen in earlier runs
+        ids, encodings, next_id = self.store.load()
+        self.index.add_many(ids, encodings)
+        # Never hand out an ID that already has a person_N folder
+        known_ids = get_face_writer(face_folder).known_ids()
+        self.next_face_id = max([next_id] + [face_id + 1 for face_id in known_ids])
+
+    def __len__(self):
+        return len(self.index)
+
+    def match_many(self, queries, tolerance=0.6):
+        """Return a (face_id or None, distance) pair for each query encoding."""
+        return self.index.match_many(queries, tolerance)
+
+    def match(self, encoding, tolerance=0.6):
+        """Return (face_id or None, distance) for the closest known face."""
+        return self.index.match(encoding, tolerance)
+
+    def add_identity(self, encoding, tolerance=0.6):
+        """Return the ID for a face no camera matched, creating and persisting it if still unknown."""
+        with self._insert_lock:
+            face_id, _ = self.index.match(encoding, tolerance)
+            if face_id is not None:
+                return face_id
+            face_id = self.next_face_id
+            self.index.add(face_id, encoding)
+            self.store.append(face_id, encoding)
+            self.next_face_id += 1
+            return face_id
+
+
+def get_shared_gallery(face_folder="detected_faces", mode="exact"):
+    """Return the process-wide SharedGallery for face_folder; mode only applies on first use."""
+    key = os.path.abspath(face_folder)
+    with _galleries_lock:
+        gallery = _galleries.get(key)
+        if gallery is None:
+            gallery = SharedGallery(face_folder, mode)
+            _galleries[key] = gallery
+        return gallery
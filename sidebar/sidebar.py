@@ -4,6 +4,7 @@ from dashboard import Ui_Dashboard
 from search import Ui_SearchApp
 from notifications import show_notifications  
 from video import VideoSearchApp
+from camera_service import shutdown_camera_service
 
 class SidebarApp(QtWidgets.QMainWindow, Ui_MainWindow):
     def __init__(self, *args, **kwargs):
@@ -52,9 +53,16 @@ class SidebarApp(QtWidgets.QMainWindow, Ui_MainWindow):
     def clear_current_widget(self):
         """Remove the current widget from the layout."""
         if hasattr(self, 'current_widget') and self.current_widget is not None:
+            if self.current_widget is getattr(self, 'dashboard_widget', None):
+                self.dashboard_ui.detach()  # Cameras keep running in the background, paused
             self.widget.layout().removeWidget(self.current_widget)
             self.current_widget.setParent(None)
 
+    def closeEvent(self, event):
+        """Stop the camera pipelines with the window rather than leaving their threads behind."""
+        shutdown_camera_service()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     import sys
     app = QtWidgets.QApplication(sys.argv)
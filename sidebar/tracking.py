@@ -0,0 +1,255 @@
+import cv2
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise intersection-over-union of two sets of [x1, y1, x2, y2] boxes."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)[None, :, :]
+    iw = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    ih = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def appearance_signature(face_img, size=16):
+    """Tiny normalised grayscale thumbnail used to notice appearance changes cheaply."""
+    if face_img.size == 0:
+        return None
+    gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY) if face_img.ndim == 3 else face_img
+    thumb = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return (thumb - thumb.mean()) / (thumb.std() + 1e-6)
+
+
+class Track(object):
+    """One tracked face: a constant-velocity Kalman filter over its box plus cached identity."""
+
+    # State is [x1, y1, x2, y2, vx1, vy1, vx2, vy2]; only the box is observed
+    _F = np.eye(8, dtype=np.float32) + np.eye(8, k=4, dtype=np.float32)
+    _H = np.eye(4, 8, dtype=np.float32)
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=int)
+        self.hits = 1
+        self.missed = 0
+        self.age = 0
+        self.best_quality = 0.0
+        self.face_id = None
+        self.last_encoded_frame = None
+        self.signature = None
+        self._pending_signature = None
+        self._x = np.zeros(8, dtype=np.float32)
+        self._x[:4] = box
+        self._P = np.diag([10, 10, 10, 10, 1000, 1000, 1000, 1000]).astype(np.float32)
+
+    def predict(self):
+        self._x = self._F @ self._x
+        self._P = self._F @ self._P @ self._F.T + np.eye(8, dtype=np.float32)
+        self.missed += 1
+        self.age += 1
+        return self._x[:4]
+
+    def update(self, box):
+        z = np.asarray(box, dtype=np.float32)
+        S = self._H @ self._P @ self._H.T + np.eye(4, dtype=np.float32) * 10.0
+        K = self._P @ self._H.T @ np.linalg.inv(S)
+        self._x = self._x + K @ (z - self._H @ self._x)
+        self._P = (np.eye(8, dtype=np.float32) - K @ self._H) @ self._P
+        self.box = np.asarray(box, dtype=int)
+        self.hits += 1
+        self.missed = 0
+
+    @property
+    def predicted_box(self):
+        return self._x[:4]
+
+    def needs_encoding(self, frame, frame_index, refresh_interval=30, appearance_threshold=0.5):
+        """True if this track should be (re-)encoded on this frame.
+
+        That is when it has no identity yet, when refresh_interval frames have
+        passed since its last encoding, or when its crop looks noticeably
+        different from the one that was last encoded.
+        """
+        x1, y1, x2, y2 = self.box
+        self._pending_signature = appearance_signature(frame[max(y1, 0):y2, max(x1, 0):x2])
+        if self.face_id is None or self.signature is None or self._pending_signature is None:
+            return True
+        if refresh_interval and frame_index - self.last_encoded_frame >= refresh_interval:
+            return True
+        return float(np.abs(self._pending_signature - self.signature).mean()) > appearance_threshold
+
+    def assign_identity(self, face_id, frame_index):
+        """Cache the gallery ID for this track until it needs encoding again."""
+        self.face_id = face_id
+        self.last_encoded_frame = frame_index
+        self.signature = self._pending_signature
+
+
+class IouTracker(object):
+    """SORT-style tracker: Kalman-predicted boxes matched greedily to detections by IoU."""
+
+    def __init__(self, iou_threshold=0.3, max_missed=10):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = []
+        self._next_track_id = 0
+
+    def update(self, boxes):
+        """Feed this frame's detections; returns the tracks matched to a detection."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        predicted = np.array([track.predict() for track in self.tracks], dtype=np.float32).reshape(-1, 4)
+        iou = iou_matrix(predicted, boxes)
+
+        matched_tracks, matched_boxes = set(), set()
+        # Greedy assignment, best overlaps first
+        for flat in np.argsort(-iou, axis=None):
+            t, b = np.unravel_index(flat, iou.shape)
+            if iou[t, b] < self.iou_threshold:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            self.tracks[t].update(boxes[b])
+            matched_tracks.add(t)
+            matched_boxes.add(b)
+
+        for b in range(len(boxes)):
+            if b not in matched_boxes:
+                self.tracks.append(Track(self._next_track_id, boxes[b]))
+                self._next_track_id += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        return self.active_tracks()
+
+    def clear(self):
+        """Forget every track, e.g. after a gap in the frames they were following."""
+        self.tracks = []
+
+    def active_tracks(self):
+        """Tracks that were seen on the latest frame."""
+        return [track for track in self.tracks if track.missed == 0]
+
+    def follow(self, tracks, boxes, confidences):
+        """Advance tracks one frame from propagated boxes instead of detections.
+
+        Tracks whose box could not be propagated (confidence 0) are left as they
+        are; the next detection frame re-associates them.
+        """
+        for track, box, confidence in zip(tracks, boxes, confidences):
+            if confidence > 0:
+                track.predict()
+                track.update(box)
+        return [track for track, confidence in zip(tracks, confidences) if confidence > 0]
+
+
+class FlowPropagator(object):
+    """Moves boxes from one frame to the next with sparse Lucas-Kanade optical flow."""
+
+    def __init__(self, max_points=20, fb_threshold=1.0):
+        self.max_points = max_points
+        self.fb_threshold = fb_threshold  # Max forward-backward error (px) for a point to count
+        self._lk_params = dict(winSize=(15, 15), maxLevel=2,
+                               criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def propagate(self, prev_gray, gray, boxes):
+        """Return (new_boxes, confidences) for boxes given in prev_gray coordinates.
+
+        Confidence is the fraction of a box's feature points that tracked
+        consistently forwards and backwards; a box with no usable points keeps
+        its position and gets confidence 0.
+        """
+        h, w = gray.shape[:2]
+        points, owners = [], []
+        for i, (x1, y1, x2, y2) in enumerate(boxes):
+            x1, y1, x2, y2 = max(int(x1), 0), max(int(y1), 0), min(int(x2), w), min(int(y2), h)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                continue
+            found = cv2.goodFeaturesToTrack(prev_gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+            if found is None:
+                continue
+            points.append(found.reshape(-1, 2) + (x1, y1))
+            owners.extend([i] * len(found))
+        new_boxes = [np.asarray(box, dtype=int) for box in boxes]
+        confidences = [0.0] * len(boxes)
+        if not points:
+            return new_boxes, confidences
+
+        p0 = np.concatenate(points).astype(np.float32).reshape(-1, 1, 2)
+        owners = np.array(owners)
+        p1, st, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **self._lk_params)
+        back, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **self._lk_params)
+        good = (st.ravel() == 1) & (st_back.ravel() == 1) & \
+            (np.linalg.norm((back - p0).reshape(-1, 2), axis=1) < self.fb_threshold)
+        p0, p1 = p0.reshape(-1, 2), p1.reshape(-1, 2)
+
+        for i, box in enumerate(boxes):
+            mine = owners == i
+            ok = mine & good
+            if not ok.any():
+                continue
+            confidences[i] = float(ok.sum()) / float(mine.sum())
+            shift = np.median(p1[ok] - p0[ok], axis=0)
+            # Scale from the spread of the points around their centre
+            spread0 = np.linalg.norm(p0[ok] - p0[ok].mean(axis=0), axis=1)
+            spread1 = np.linalg.norm(p1[ok] - p1[ok].mean(axis=0), axis=1)
+            scale = float(np.median(spread1 / np.maximum(spread0, 1e-3))) if ok.sum() > 2 else 1.0
+            x1, y1, x2, y2 = np.asarray(box, dtype=np.float32)
+            cx, cy = (x1 + x2) / 2 + shift[0], (y1 + y2) / 2 + shift[1]
+            half_w, half_h = (x2 - x1) * scale / 2, (y2 - y1) * scale / 2
+            new_boxes[i] = np.array([cx - half_w, cy - half_h, cx + half_w, cy + half_h]).round().astype(int)
+        return new_boxes, confidences
+
+
+class DetectionCadence(object):
+    """Decides on which frames the full detector runs; the rest are tracked.
+
+    The detector runs every `every` frames, or sooner when tracking confidence
+    drops below min_confidence. With target_fps set, `every` adapts on its own:
+    it is the smallest cadence whose average per-frame cost, measured from
+    recent detect and track frames, fits the camera's budget of
+    core_share / target_fps seconds per frame.
+    """
+
+    def __init__(self, every=5, min_confidence=0.6, target_fps=None, core_share=1.0, min_every=1, max_every=30):
+        self.every = every
+        self.min_confidence = min_confidence
+        self.target_fps = target_fps
+        self.core_share = core_share
+        self.min_every = min_every
+        self.max_every = max_every
+        self.detect_seconds = None
+        self.track_seconds = None
+        self._since_detect = every
+
+    def should_detect(self, confidence=1.0):
+        if self._since_detect >= self.every or confidence < self.min_confidence:
+            self._since_detect = 1
+            return True
+        self._since_detect += 1
+        return False
+
+    def defer(self):
+        """The due detection was skipped (e.g. nothing moved); run it on the next frame instead."""
+        self._since_detect = self.every
+
+    def record(self, detected, seconds, alpha=0.1):
+        """Feed back how long a frame took so the cadence can adapt."""
+        if detected:
+            self.detect_seconds = seconds if self.detect_seconds is None else \
+                (1 - alpha) * self.detect_seconds + alpha * seconds
+        else:
+            self.track_seconds = seconds if self.track_seconds is None else \
+                (1 - alpha) * self.track_seconds + alpha * seconds
+        if not self.target_fps or self.detect_seconds is None:
+            return
+        budget = self.core_share / self.target_fps
+        track = self.track_seconds or 0.0
+        if self.detect_seconds <= budget:
+            every = self.min_every
+        elif track >= budget:
+            every = self.max_every
+        else:
+            # (detect + (k - 1) * track) / k <= budget
+            every = int(np.ceil((self.detect_seconds - track) / (budget - track)))
+        self.every = int(np.clip(every, self.min_every, self.max_every))
@@ -1,20 +1,35 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
 import cv2
+import face_recognition
 import numpy as np
 import os
 import pandas as pd
 import threading
+import time
+from video_scan import scan_video, PyramidScorer
+from video_index import open_index
 cv2.setNumThreads(1) 
 
 class VideoSearchApp(QtWidgets.QWidget):
+    search_finished = QtCore.pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.init_ui()
         self.target_image = None
         self.video_path = None
-        self.cap = None
+        self.cap = None  # Playback decoder only; the search opens its own
+        self.fps = 30.0
+        self.play_start = 0.0
+        self.play_frame = 0  # Index of the next frame cap will return
+        self.frames_dropped = 0
+        self.face_stride = 5  # Face search looks at every 5th frame
+        self.scan_lock = threading.Lock()  # Scans use every core, so they run one at a time
         self.timer = QtCore.QTimer()
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
         self.timer.timeout.connect(self.update_frame)
+        # Results come back from the search thread; widgets are only touched on the GUI thread
+        self.search_finished.connect(self.result_label.setText)
 
     def init_ui(self):
         self.setWindowTitle("Video Search Application")
@@ -33,6 +48,10 @@ class VideoSearchApp(QtWidgets.QWidget):
         self.search_button.clicked.connect(self.start_search)
         layout.addWidget(self.search_button)
 
+        self.face_search_button = QtWidgets.QPushButton("Search Person (Face)")
+        self.face_search_button.clicked.connect(self.start_face_search)
+        layout.addWidget(self.face_search_button)
+
         # Video display area
         self.video_label = QtWidgets.QLabel("Video will be displayed here")
         self.video_label.setScaledContents(True)
@@ -71,63 +90,112 @@ class VideoSearchApp(QtWidgets.QWidget):
 
         self.result_label.setText("Searching...")
 
-        # Open video file
+        # Open video file for playback
+        self.timer.stop()
+        if self.cap is not None:
+            self.cap.release()
         self.cap = cv2.VideoCapture(self.video_path)
         if not self.cap.isOpened():
             QtWidgets.QMessageBox.warning(self, "Failed to Open Video", "Failed to open the video file.")
             return
 
-        # Start the video playback and search
-        self.timer.start(30)  # 30 ms interval for frame updates
+        # Start the video playback and search, paced by the video's own frame rate
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.play_start = time.monotonic()
+        self.play_frame = 0
+        self.frames_dropped = 0
+        self.timer.start(max(int(1000 / self.fps / 2), 1))  # Tick at twice the frame rate so frames are not late
 
         # Start the search in a separate thread
-        search_thread = threading.Thread(target=self.search_target)
+        search_thread = threading.Thread(target=self.search_target, daemon=True)
         search_thread.start()
 
-    def update_frame(self):
-        """Update the video frame displayed in QLabel."""
-        if self.cap:
-            ret, frame = self.cap.read()
-            if ret:
-                # Convert the frame to RGB format and display it in QLabel
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                height, width, _ = frame_rgb.shape
-                qimg = QtGui.QImage(frame_rgb.data, width, height, width * 3, QtGui.QImage.Format_RGB888)
-                pixmap = QtGui.QPixmap.fromImage(qimg)
-                self.video_label.setPixmap(pixmap)
-
-            else:
-                self.timer.stop()
-                self.cap.release()
-
-    def search_target(self):
-        """Search for the target image in the video."""
-        target_gray = cv2.cvtColor(self.target_image, cv2.COLOR_BGR2GRAY)
-        target_w, target_h = self.target_image.shape[1], self.target_image.shape[0]
+    def start_face_search(self):
+        """Find a person in the video by face, from one or more photos of them."""
+        if not self.video_path:
+            QtWidgets.QMessageBox.warning(self, "No Video", "Please upload a video before starting the search.")
+            return
 
-        frame_count = 0
-        detected_frames = []
+        image_paths, _ = QtWidgets.QFileDialog.getOpenFileNames(self, "Select Photos of the Person", "", "Image Files (*.png *.jpg *.jpeg *.bmp)")
+        if not image_paths:
+            QtWidgets.QMessageBox.warning(self, "No Image", "Please select at least one photo.")
+            return
 
-        while self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                break
+        target_encodings = []
+        for image_path in image_paths:
+            target_encodings.extend(face_recognition.face_encodings(face_recognition.load_image_file(image_path))[:1])
+        if not target_encodings:
+            QtWidgets.QMessageBox.warning(self, "No Face", "No face was found in the selected photos.")
+            return
 
-            frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            result = cv2.matchTemplate(frame_gray, target_gray, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        self.result_label.setText("Searching for the person...")
+        search_thread = threading.Thread(target=self.search_faces, args=(target_encodings, self.face_stride), daemon=True)
+        search_thread.start()
 
-            if max_val > 0.8:  # Detection threshold
-                detected_frames.append(frame_count)
+    def search_faces(self, target_encodings, stride=5, tolerance=0.6):
+        """Search every stride-th frame for faces close to the target encodings."""
+        try:
+            # The first search of a video builds its face index; later ones only load and query it
+            with self.scan_lock:
+                hits = open_index(self.video_path, stride).search(target_encodings, tolerance)
+        except Exception as e:
+            self.search_finished.emit(f"Face search failed: {e}")
+            return
+        if not hits:
+            self.search_finished.emit("Person not found in the video.")
+            return
+        # Best hit per second of video, so a long appearance reads as one line per second
+        best = {}
+        for timestamp, frame_number, box, confidence in hits:
+            second = int(timestamp)
+            if second not in best or confidence > best[second][1]:
+                best[second] = (timestamp, confidence)
+        lines = [f"{int(t // 3600):02d}:{int(t % 3600 // 60):02d}:{t % 60:04.1f} ({c:.0%})" for t, c in best.values()]
+        self.search_finished.emit(f"Person found at: {', '.join(lines)}")
 
-            frame_count += 1
+    def update_frame(self):
+        """Show the frame due at the current playback time, skipping frames when behind."""
+        if not self.cap:
+            return
+        due = int((time.monotonic() - self.play_start) * self.fps)
+        if due < self.play_frame:
+            return  # Next frame is not due yet
+        # Behind schedule: grab() skips the frames we have no time to show without converting them
+        ret = True
+        while ret and self.play_frame < due:
+            ret = self.cap.grab()
+            self.play_frame += 1
+            self.frames_dropped += 1
+        if ret:
+            ret, frame = self.cap.read()
+            self.play_frame += 1
+        if ret:
+            # Convert the frame to RGB format and display it in QLabel
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            height, width, _ = frame_rgb.shape
+            qimg = QtGui.QImage(frame_rgb.data, width, height, width * 3, QtGui.QImage.Format_RGB888)
+            pixmap = QtGui.QPixmap.fromImage(qimg)
+            self.video_label.setPixmap(pixmap)
+        else:
+            self.timer.stop()
+            self.cap.release()
+            self.cap = None
 
-        self.cap.release()
+    def search_target(self):
+        """Search for the target image in the video."""
+        try:
+            # Frame ranges are decoded and matched in parallel, one decoder per worker process
+            with self.scan_lock:
+                scores = scan_video(self.video_path, PyramidScorer(self.target_image))  # Multi-scale, coarse-to-fine
+        except Exception as e:
+            self.search_finished.emit(f"Search failed: {e}")
+            return
+        detected_frames = np.nonzero(scores > 0.8)[0].tolist()  # Detection threshold
 
         if detected_frames:
-            self.result_label.setText(f"Target image detected in frames: {', '.join(map(str, detected_frames))}")
+            self.search_finished.emit(f"Target image detected in frames: {', '.join(map(str, detected_frames))}")
         else:
-            self.result_label.setText("Target image not detected in the video.")
+            self.search_finished.emit("Target image not detected in the video.")
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+from video_scan import VideoFaces, scan_faces
+
+_VERSION = 1
+# Used when the video's own folder cannot be written to, e.g. footage on a read-only share
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "eye_of_sauron", "video_faces")
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def index_path(video_path, index_dir=None):
+    """Where the sidecar index of video_path lives: next to the video unless index_dir is given."""
+    name = os.path.basename(video_path) + ".faces.npz"
+    return os.path.join(index_dir if index_dir is not None else os.path.dirname(os.path.abspath(video_path)), name)
+
+
+def _cache_path(video_path):
+    # The full path is hashed in so videos with the same name in different folders do not collide
+    digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{digest}-{os.path.basename(video_path)}.faces.npz")
+
+
+def _index_paths(video_path, index_dir=None):
+    return [index_path(video_path, index_dir), _cache_path(video_path)]
+
+
+def _source_stamp(video_path):
+    # Size and modification time identify the exact file the index was built from
+    stat = os.stat(video_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_index(video_path, stride=5, min_face_size=40, thumbnail_size=0, index_dir=None):
+    """Load the sidecar index (or its cache fallback), or None if missing, stale or built with other settings."""
+    for path in _index_paths(video_path, index_dir):
+        faces = _load(path, video_path, stride, min_face_size, thumbnail_size)
+        if faces is not None:
+            return faces
+    return None
+
+
+def _load(path, video_path, stride, min_face_size, thumbnail_size):
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != _VERSION or meta.get("source") != _source_stamp(video_path) \
+                    or meta.get("stride") != stride or meta.get("min_face_size") != min_face_size \
+                    or meta.get("thumbnail_size", 0) < thumbnail_size:
+                return None
+            return VideoFaces(data["frames"], data["boxes"], data["encodings"], meta["fps"],
+                              data["thumbnails"] if meta.get("thumbnail_size") else None)
+    except (OSError, ValueError, KeyError):
+        return None  # Unreadable or half-written by an older build; it is rebuilt
+
+
+def save_index(video_path, faces, stride, min_face_size, thumbnail_size=0, index_dir=None):
+    """Write faces as the sidecar index of video_path, atomically via a temporary file.
+
+    Falls back to CACHE_DIR when the sidecar location cannot be written.
+    Returns the path written, or None if neither location was writable.
+    """
+    meta = {"version": _VERSION, "source": _source_stamp(video_path), "stride": stride,
+            "min_face_size": min_face_size, "thumbnail_size": thumbnail_size, "fps": faces.fps}
+    arrays = {"frames": faces.frames, "boxes": faces.boxes, "encodings": faces.encodings}
+    if faces.thumbnails is not None:
+        arrays["thumbnails"] = faces.thumbnails
+    for path in _index_paths(video_path, index_dir):
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            return path
+        except OSError as e:
+            print(f"Unable to write face index {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return None
+
+
+def open_index(video_path, stride=5, min_face_size=40, thumbnail_size=0, index_dir=None, workers=None,
+               progress=None):
+    """Return the face index of a video, decoding and indexing it only if no valid sidecar exists.
+
+    The first call for a video scans it with scan_faces and saves the result
+    next to it (or in CACHE_DIR); later calls, in this or any later session,
+    load it in milliseconds. If the index cannot be saved anywhere, the scan is
+    still returned. Editing or replacing the video changes its size or mtime
+    and makes the index rebuild. Concurrent calls for one video build it once.
+    """
+    key = index_path(video_path, index_dir)
+    with _locks_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        faces = load_index(video_path, stride, min_face_size, thumbnail_size, index_dir)
+        if faces is None:
+            faces = scan_faces(video_path, stride=stride, min_face_size=min_face_size,
+                               thumbnail_size=thumbnail_size, workers=workers, progress=progress)
+            save_index(video_path, faces, stride, min_face_size, thumbnail_size, index_dir)
+        return faces
+
+
+def benchmark(video_path, target_path, stride=5):
+    """Time a cold ingest, a warm index load and a query against the loaded index."""
+    import face_recognition
+    targets = face_recognition.face_encodings(face_recognition.load_image_file(target_path))
+    for path in _index_paths(video_path):
+        if os.path.exists(path):
+            os.remove(path)
+    start = time.perf_counter()
+    open_index(video_path, stride)
+    ingest_s = time.perf_counter() - start
+    start = time.perf_counter()
+    faces = open_index(video_path, stride)
+    load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    hits = faces.search(targets)
+    query_s = time.perf_counter() - start
+    print(f"{len(faces)} faces: ingest {ingest_s:.1f}s, load {load_s * 1000:.1f} ms, "
+          f"query {query_s * 1000:.2f} ms ({len(hits)} hits)")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(*sys.argv[1:3])
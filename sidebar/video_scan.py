@@ -0,0 +1,306 @@
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+
+
+def frame_ranges(frame_count, chunks):
+    """Split [0, frame_count) into up to chunks contiguous (start, stop) ranges."""
+    chunks = max(1, min(chunks, frame_count))
+    bounds = np.linspace(0, frame_count, chunks + 1).astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+class TemplateScorer(object):
+    """Best TM_CCOEFF_NORMED score of a template in each frame."""
+
+    def __init__(self, template):
+        self.template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY) if template.ndim == 3 else template
+
+    def __call__(self, frame):
+        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        result = cv2.matchTemplate(frame_gray, self.template, cv2.TM_CCOEFF_NORMED)
+        return cv2.minMaxLoc(result)[1]
+
+
+class PyramidScorer(object):
+    """Coarse-to-fine, multi-scale TM_CCOEFF_NORMED matching.
+
+    The template is resized to every factor in scales. Each size is first
+    matched against a copy of the frame shrunk by coarse (less when that would
+    leave the template under min_template pixels), and the best candidates
+    across all sizes are re-matched at full resolution in a window of margin
+    pixels around their position. Scores are comparable to TemplateScorer's.
+    """
+
+    def __init__(self, template, scales=tuple(np.geomspace(0.5, 2.0, 9)), coarse=0.25, candidates=4,
+                 min_template=12, margin=8):
+        gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY) if template.ndim == 3 else template
+        self.candidates = candidates
+        self.margin = margin
+        self.levels = []  # (scale, factor, full-resolution template, coarse template)
+        for scale in scales:
+            h, w = max(int(gray.shape[0] * scale), 1), max(int(gray.shape[1] * scale), 1)
+            full = cv2.resize(gray, (w, h), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+            factor = min(1.0, max(coarse, min_template / float(min(h, w))))
+            small = cv2.resize(full, (max(int(w * factor), 1), max(int(h * factor), 1)), interpolation=cv2.INTER_AREA)
+            self.levels.append((scale, factor, full, small))
+
+    def match(self, frame):
+        """Return (score, (x1, y1, x2, y2), scale) of the best match, or (-1.0, None, None)."""
+        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        fh, fw = frame_gray.shape
+        shrunk = {}
+        found = []
+        for level, (scale, factor, full, small) in enumerate(self.levels):
+            if full.shape[0] > fh or full.shape[1] > fw:
+                continue
+            if factor not in shrunk:
+                shrunk[factor] = frame_gray if factor >= 1.0 else cv2.resize(
+                    frame_gray, (max(int(fw * factor), 1), max(int(fh * factor), 1)), interpolation=cv2.INTER_AREA)
+            image = shrunk[factor]
+            if small.shape[0] > image.shape[0] or small.shape[1] > image.shape[1]:
+                continue
+            result = cv2.matchTemplate(image, small, cv2.TM_CCOEFF_NORMED)
+            th, tw = small.shape
+            for _ in range(self.candidates):
+                _, score, _, (x, y) = cv2.minMaxLoc(result)
+                found.append((score, level, x / factor, y / factor))
+                # Suppress this peak so the next candidate is a different place
+                result[max(y - th // 2, 0):y + th // 2 + 1, max(x - tw // 2, 0):x + tw // 2 + 1] = -1.0
+
+        best = (-1.0, None, None)
+        for _, level, x, y in sorted(found, reverse=True)[:self.candidates]:
+            scale, factor, full, _ = self.levels[level]
+            th, tw = full.shape
+            pad = self.margin + int(np.ceil(1.0 / factor))
+            x1, y1 = max(int(x) - pad, 0), max(int(y) - pad, 0)
+            x2, y2 = min(int(x) + tw + pad, fw), min(int(y) + th + pad, fh)
+            window = frame_gray[y1:y2, x1:x2]
+            if window.shape[0] < th or window.shape[1] < tw:
+                continue
+            _, score, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(window, full, cv2.TM_CCOEFF_NORMED))
+            if score > best[0]:
+                best = (score, (x1 + dx, y1 + dy, x1 + dx + tw, y1 + dy + th), scale)
+        return best
+
+    def __call__(self, frame):
+        return self.match(frame)[0]
+
+
+def _scan_range(video_path, start, stop, scorer):
+    # One decoder per range, seeked to its first frame; stop=None reads to the end of the file
+    cv2.setNumThreads(1)
+    cap = cv2.VideoCapture(video_path)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    scores = []
+    while stop is None or start + len(scores) < stop:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        scores.append(scorer(frame))
+    cap.release()
+    return start, np.asarray(scores, dtype=np.float32)
+
+
+def _video_info(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open video: {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return frame_count, fps
+
+
+def _run_ranges(video_path, job, args, workers=None, chunks_per_worker=4, progress=None):
+    """Run job(video_path, start, stop, *args) over frame ranges in a process pool.
+
+    Returns the jobs' results in frame order. More ranges than workers keep the
+    pool busy when some ranges decode slower than others; progress, if given,
+    is called with the fraction of ranges done.
+    """
+    workers = workers or os.cpu_count() or 1
+    frame_count, _ = _video_info(video_path)
+    if workers == 1 or frame_count <= 0:
+        return [job(video_path, 0, None, *args)[1]]
+
+    ranges = frame_ranges(frame_count, workers * chunks_per_worker)
+    # The frame count is only the container's estimate, so the last range reads to the real end
+    ranges[-1] = (ranges[-1][0], None)
+    parts = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        futures = [pool.submit(job, video_path, start, stop, *args) for start, stop in ranges]
+        for future in as_completed(futures):
+            start, result = future.result()
+            parts[start] = result
+            if progress is not None:
+                progress(len(parts) / float(len(ranges)))
+    return [parts[start] for start, _ in ranges]
+
+
+def scan_video(video_path, scorer, workers=None, chunks_per_worker=4, progress=None):
+    """Score every frame of a video in parallel; returns one float32 score per frame, in order.
+
+    The video is split into frame ranges, each decoded and scored by its own
+    worker process with its own VideoCapture. scorer must be picklable (e.g.
+    TemplateScorer or PyramidScorer).
+    """
+    return np.concatenate(_run_ranges(video_path, _scan_range, (scorer,), workers, chunks_per_worker, progress))
+
+
+def _faces_in_range(video_path, start, stop, stride, detection_scale, upsample, thumbnail_size=0):
+    # Frames whose index is a multiple of stride are detected and encoded; the rest are only grabbed
+    cv2.setNumThreads(1)
+    from faces import detect_faces, encode_faces
+    cap = cv2.VideoCapture(video_path)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    frames, boxes, encodings, thumbnails = [], [], [], []
+    index = start
+    while stop is None or index < stop:
+        if index % stride:
+            if not cap.grab():
+                break
+            index += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = detect_faces(rgb_frame, detection_scale, upsample)
+        for (top, right, bottom, left), encoding in zip(locations, encode_faces(rgb_frame, locations)):
+            frames.append(index)
+            boxes.append((left, top, right, bottom))
+            encodings.append(encoding)
+            if thumbnail_size:
+                crop = frame[max(top, 0):bottom, max(left, 0):right]
+                thumbnails.append(cv2.resize(crop, (thumbnail_size, thumbnail_size), interpolation=cv2.INTER_AREA))
+        index += 1
+    cap.release()
+    return start, (np.asarray(frames, dtype=np.int64), np.asarray(boxes, dtype=np.int32).reshape(-1, 4),
+                   np.asarray(encodings, dtype=np.float32).reshape(-1, 128),
+                   np.asarray(thumbnails, dtype=np.uint8).reshape(len(frames) if thumbnail_size else 0,
+                                                                   thumbnail_size, thumbnail_size, 3))
+
+
+class VideoFaces(object):
+    """Every face found in a video.
+
+    Holds frame numbers, [x1, y1, x2, y2] boxes, 128-d encodings and, when
+    requested, small BGR thumbnails, all aligned row for row.
+    """
+
+    def __init__(self, frames, boxes, encodings, fps, thumbnails=None):
+        self.frames = frames
+        self.boxes = boxes
+        self.encodings = encodings
+        self.fps = fps
+        self.thumbnails = thumbnails
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def timestamps(self):
+        return self.frames / float(self.fps)
+
+    def search(self, targets, tolerance=0.6):
+        """Faces matching any of the target encodings, in one vectorized distance computation.
+
+        Returns (timestamp, frame, box, confidence) tuples in frame order.
+        Confidence is 1 - distance / (2 * tolerance): 1.0 for an identical
+        encoding, 0.5 right at the tolerance.
+        """
+        targets = np.asarray(targets, dtype=np.float32).reshape(-1, 128)
+        if not len(self) or not len(targets):
+            return []
+        sq = (self.encodings ** 2).sum(1)[:, None] - 2.0 * (self.encodings @ targets.T) + (targets ** 2).sum(1)[None, :]
+        distances = np.sqrt(np.maximum(sq, 0.0)).min(axis=1)
+        hits = np.nonzero(distances <= tolerance)[0]
+        confidences = 1.0 - distances[hits] / (2.0 * tolerance)
+        timestamps = self.timestamps
+        return [(float(timestamps[i]), int(self.frames[i]), tuple(int(v) for v in self.boxes[i]), float(c))
+                for i, c in zip(hits, confidences)]
+
+
+def scan_faces(video_path, stride=5, min_face_size=40, upsample=1, thumbnail_size=0, workers=None, progress=None):
+    """Detect and encode faces in every stride-th frame of a video, in parallel frame ranges.
+
+    Detection runs on a copy scaled so faces of min_face_size pixels are still
+    found (see faces.auto_detection_scale). With thumbnail_size set, each face
+    is also kept as a square crop of that many pixels. Returns a VideoFaces.
+    """
+    from faces import auto_detection_scale
+    _, fps = _video_info(video_path)
+    args = (stride, auto_detection_scale(min_face_size, upsample), upsample, thumbnail_size)
+    parts = _run_ranges(video_path, _faces_in_range, args, workers, progress=progress)
+    frames, boxes, encodings, thumbnails = (np.concatenate(field) for field in zip(*parts))
+    return VideoFaces(frames, boxes, encodings, fps, thumbnails if thumbnail_size else None)
+
+
+def benchmark_faces(video_path, target_path, strides=(1, 5, 10)):
+    """Face-search speed as a multiple of real time, per stride."""
+    import face_recognition
+    targets = face_recognition.face_encodings(face_recognition.load_image_file(target_path))
+    frame_count, fps = _video_info(video_path)
+    for stride in strides:
+        start = time.perf_counter()
+        hits = scan_faces(video_path, stride=stride).search(targets)
+        seconds = time.perf_counter() - start
+        print(f"stride {stride:>2}: {frame_count / fps / seconds:6.1f}x real time, {len(hits)} hits")
+
+
+def benchmark_matchers(video_path, template_path, max_frames=300, threshold=0.8):
+    """Time per frame of full-resolution single-scale matching vs the pyramid matcher."""
+    template = cv2.imread(template_path)
+    exact, pyramid = TemplateScorer(template), PyramidScorer(template)
+    cap = cv2.VideoCapture(video_path)
+    exact_s = pyramid_s = 0.0
+    n = exact_hits = pyramid_hits = both = 0
+    while n < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        start = time.perf_counter()
+        exact_hit = exact(frame) > threshold
+        exact_s += time.perf_counter() - start
+        start = time.perf_counter()
+        pyramid_hit = pyramid(frame) > threshold
+        pyramid_s += time.perf_counter() - start
+        n += 1
+        exact_hits += exact_hit
+        pyramid_hits += pyramid_hit
+        both += exact_hit and pyramid_hit
+    cap.release()
+    if not n:
+        print("No frames decoded.")
+        return
+    print(f"{n} frames: full-res {exact_s * 1000 / n:.2f} ms/frame ({exact_hits} hits), "
+          f"pyramid {pyramid_s * 1000 / n:.2f} ms/frame ({pyramid_hits} hits, {both} shared), "
+          f"{exact_s / max(pyramid_s, 1e-9):.1f}x faster")
+
+
+def benchmark(video_path, template_path, counts=(1, 2, 4, 8)):
+    """Frames per second scanned vs worker count, checking every run against the sequential scores."""
+    scorer = TemplateScorer(cv2.imread(template_path))
+    baseline = None
+    for workers in counts:
+        if workers > (os.cpu_count() or 1):
+            break
+        start = time.perf_counter()
+        scores = scan_video(video_path, scorer, workers=workers)
+        seconds = time.perf_counter() - start
+        if baseline is None:
+            baseline = scores
+        same = len(scores) == len(baseline) and np.allclose(scores, baseline, atol=1e-4)
+        print(f"{workers:>2} workers: {len(scores) / seconds:8.1f} FPS ({seconds:.1f}s, "
+              f"{'matches' if same else 'DIFFERS FROM'} sequential)")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(*sys.argv[1:3])
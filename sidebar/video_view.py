@@ -0,0 +1,64 @@
+import cv2
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtGui import QImage
+
+
+class VideoView(QtWidgets.QOpenGLWidget):
+    """A camera tile that scales frames on the GPU instead of on the GUI thread.
+
+    Frames go in as QImages (straight from a FrameChannel's frame_ready) or BGR
+    NumPy arrays. Nothing is resized on the CPU: paintGL draws the image into
+    the letterboxed target rectangle through Qt's OpenGL paint engine, which
+    uploads it as a texture and lets the GPU do the filtering. Without a GPU
+    the same path runs on Mesa's llvmpipe. Repaints are coalesced by update(),
+    so a tile never paints more often than the event loop can take.
+    """
+
+    def __init__(self, parent=None, background=QtGui.QColor(0, 0, 0), border=None, keep_aspect=True):
+        super().__init__(parent)
+        self.background = QtGui.QColor(background)
+        self.border = QtGui.QColor(border) if border is not None else None
+        self.keep_aspect = keep_aspect
+        self.frames_shown = 0
+        self._image = None
+        self._text = ""
+
+    def set_image(self, image):
+        """Show a QImage from the next repaint on."""
+        self._image = image
+        self._text = ""
+        self.update()
+
+    def set_frame(self, frame):
+        """Show a BGR NumPy frame (GUI thread; use a FrameChannel from worker threads)."""
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = rgb.shape
+        self.set_image(QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888).copy())
+
+    def set_text(self, text):
+        """Clear the picture and show a line of text instead."""
+        self._image = None
+        self._text = text
+        self.update()
+
+    def _target_rect(self, image):
+        if not self.keep_aspect:
+            return QtCore.QRectF(self.rect())
+        size = QtCore.QSizeF(image.size()).scaled(QtCore.QSizeF(self.size()), QtCore.Qt.KeepAspectRatio)
+        return QtCore.QRectF((self.width() - size.width()) / 2.0, (self.height() - size.height()) / 2.0,
+                             size.width(), size.height())
+
+    def paintGL(self):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), self.background)
+        if self._image is not None:
+            painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+            painter.drawImage(self._target_rect(self._image), self._image)
+            self.frames_shown += 1
+        elif self._text:
+            painter.setPen(QtGui.QColor(0, 0, 0) if self.background.lightness() > 127 else QtGui.QColor(255, 255, 255))
+            painter.drawText(self.rect(), QtCore.Qt.AlignCenter, self._text)
+        if self.border is not None:
+            painter.setPen(QtGui.QPen(self.border, 2))
+            painter.drawRect(self.rect().adjusted(1, 1, -1, -1))
+        painter.end()
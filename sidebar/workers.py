@@ -0,0 +1,288 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from capture import FrameGrabber
+
+
+def _slot_dtype(shape, max_faces, dim=128):
+    # seq_begin/seq_end bracket each write so a reader can tell a torn slot from a finished one
+    return np.dtype([
+        ("seq_begin", "<i8"),
+        ("n_faces", "<i8"),
+        ("timestamp", "<f8"),
+        ("boxes", "<i4", (max_faces, 4)),
+        ("encodings", "<f4", (max_faces, dim)),
+        ("frame", "u1", tuple(shape)),
+        ("seq_end", "<i8"),
+    ])
+
+
+class FrameRing(object):
+    """A small ring of (frame, boxes, encodings) slots in multiprocessing shared memory.
+
+    One worker process writes, the UI process reads the newest finished slot.
+    Nothing is pickled: both sides view the same buffer through NumPy.
+    """
+
+    def __init__(self, shape, slots=4, max_faces=32, name=None, create=False):
+        self.shape = tuple(shape)
+        self.max_faces = max_faces
+        self.dtype = _slot_dtype(self.shape, max_faces)
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.dtype.itemsize * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.slots = np.ndarray((slots,), dtype=self.dtype, buffer=self.shm.buf)
+        if create:
+            self.slots["seq_begin"] = 0
+            self.slots["seq_end"] = 0
+        self.seq = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame, boxes, encodings):
+        """Publish one frame and its detections (writer side)."""
+        self.seq += 1
+        slot = self.slots[self.seq % len(self.slots)]
+        slot["seq_begin"] = self.seq
+        n = min(len(boxes), self.max_faces)
+        slot["n_faces"] = n
+        slot["timestamp"] = time.time()
+        if n:
+            slot["boxes"][:n] = np.asarray(boxes[:n], dtype=np.int32).reshape(-1, 4)
+            slot["encodings"][:n] = np.asarray(encodings[:n], dtype=np.float32).reshape(n, -1)
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        slot["frame"][...] = frame
+        slot["seq_end"] = self.seq
+
+    def read_latest(self, after_seq=0):
+        """Copy out the newest finished slot newer than after_seq (reader side).
+
+        Returns (seq, frame, boxes, encodings) or None when nothing new is ready.
+        """
+        for _ in range(3):
+            ends = self.slots["seq_end"]
+            index = int(np.argmax(ends))
+            seq = int(ends[index])
+            if seq <= after_seq:
+                return None
+            slot = self.slots[index]
+            if int(slot["seq_begin"]) != seq:
+                continue  # being overwritten right now
+            n = int(slot["n_faces"])
+            frame = slot["frame"].copy()
+            boxes = slot["boxes"][:n].copy()
+            encodings = slot["encodings"][:n].copy()
+            # The writer may have lapped us while we copied
+            if int(slot["seq_begin"]) == seq and int(slot["seq_end"]) == seq:
+                return seq, frame, boxes, encodings
+        return None
+
+    def close(self, unlink=False):
+        del self.slots
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class CameraPipeline(object):
+    """Capture, YOLO detection and face encoding for one camera, in whatever process runs it."""
+
+    def __init__(self, source, weights_path, face_box_padding=0.1):
+        from ultralytics import YOLO
+        self.source = source
+        self.face_box_padding = face_box_padding
+        # Newest-frame grabber with the reconnect supervisor; recorded footage restarts at its end
+        self.cap = FrameGrabber(source)
+        self.model = YOLO(weights_path)
+        from faces import FaceQualityGate
+        self.quality_gate = FaceQualityGate()
+
+    def read(self, timeout=None):
+        return self.cap.read(timeout)
+
+    def suspend(self):
+        """Give the capture device back while paused, so the camera is not decoded."""
+        self.cap.release()
+
+    def resume(self):
+        if self.cap.released:
+            self.cap = FrameGrabber(self.source)
+
+    def process(self, frame):
+        """Return (boxes, encodings) for every face YOLO finds in frame."""
+        from faces import boxes_to_locations, encode_faces
+        results = self.model(frame, verbose=False)
+        boxes = np.concatenate([r.boxes.xyxy.cpu().numpy() for r in results]).astype(int).reshape(-1, 4)
+        if not len(boxes):
+            return boxes, np.empty((0, 128), dtype=np.float32)
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = self.quality_gate.filter(rgb_frame, boxes_to_locations(boxes, frame.shape, self.face_box_padding))
+        encodings = encode_faces(rgb_frame, locations)
+        keep = [i for i, encoding in enumerate(encodings) if encoding is not None]
+        return boxes[keep], np.array([encodings[i] for i in keep], dtype=np.float32).reshape(-1, 128)
+
+    def release(self):
+        self.cap.release()
+
+
+def camera_worker(source, weights_path, ai_enabled, stop_event, control_queue, max_faces=32, paused=None,
+                  open_timeout=10.0):
+    """Worker process entry point: run one CameraPipeline and publish into a FrameRing."""
+    try:
+        pipeline = CameraPipeline(source, weights_path)
+    except Exception as e:
+        control_queue.put(("error", f"Unable to start camera pipeline for {source}: {e}"))
+        return
+    ret, frame = pipeline.read(open_timeout)
+    if not ret:
+        pipeline.release()
+        control_queue.put(("error", f"Unable to open camera feed with index: {source}"))
+        return
+    ring = FrameRing(frame.shape, max_faces=max_faces, create=True)
+    control_queue.put(("ready", ring.name, frame.shape))
+    failing = False
+    try:
+        while not stop_event.is_set():
+            if paused is not None and paused.is_set():
+                pipeline.suspend()
+                frame = None
+                time.sleep(0.05)
+                continue
+            if frame is None:
+                timeout = open_timeout if pipeline.cap.released else None
+                pipeline.resume()
+                # read() waits out a dead camera while the supervisor reopens it
+                ret, frame = pipeline.read(timeout)
+                if not ret:
+                    frame = None
+                    continue
+            boxes, encodings = (), ()
+            if ai_enabled.is_set():
+                try:
+                    boxes, encodings = pipeline.process(frame)
+                    failing = False
+                except Exception as e:
+                    # One bad frame (or a broken model) must not take the camera down; report it once
+                    if not failing:
+                        print(f"Face processing failed on camera {source}: {e}")
+                        failing = True
+            ring.write(frame, boxes, encodings)
+            frame = None
+    finally:
+        pipeline.release()
+        ring.close(unlink=True)
+
+
+class CameraProcess(object):
+    """UI-side handle for one camera pipeline running in its own worker process."""
+
+    def __init__(self, source, weights_path):
+        ctx = mp.get_context("spawn")
+        self.source = source
+        self.ai_enabled = ctx.Event()
+        self.stop_event = ctx.Event()
+        self.paused = ctx.Event()
+        self.control_queue = ctx.Queue()
+        self.process = ctx.Process(target=camera_worker, name=f"camera-{source}", daemon=True,
+                                   args=(source, weights_path, self.ai_enabled, self.stop_event,
+                                         self.control_queue, 32, self.paused))
+        self.ring = None
+        self.seq = 0
+        self.received = 0
+
+    def start(self, timeout=60.0):
+        """Start the worker and attach to its ring; raises ValueError if the camera fails or hangs."""
+        self.process.start()
+        try:
+            message = self.control_queue.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise ValueError(f"Camera worker for {self.source} did not start within {timeout:.0f} s")
+        if message[0] == "error":
+            self.process.join()
+            raise ValueError(message[1])
+        _, name, shape = message
+        self.ring = FrameRing(shape, name=name)
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def read(self, timeout=1.0, poll=0.002):
+        """Wait for a newer slot; returns (frame, boxes, encodings) or None on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            latest = self.ring.read_latest(self.seq)
+            if latest is not None:
+                self.seq, frame, boxes, encodings = latest
+                self.received += 1
+                return frame, boxes, encodings
+            if time.monotonic() >= deadline or not self.process.is_alive():
+                return None
+            time.sleep(poll)
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(timeout=5.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+def benchmark(video_path, weights_path="yolov8n.pt", counts=(1, 2, 4, 8, 16), seconds=20.0):
+    """Total processed FPS vs camera count, worker processes against in-process threads.
+
+    Every simulated camera loops over the same recording with AI on (the
+    capture supervisor reopens it at its end).
+    """
+    for n in counts:
+        cameras = [CameraProcess(video_path, weights_path) for _ in range(n)]
+        for camera in cameras:
+            camera.start()
+            camera.ai_enabled.set()
+        time.sleep(2.0)  # let the workers warm up
+        for camera in cameras:
+            camera.read(timeout=0.0)
+        # Ring sequence numbers count every frame a worker finished, read or not
+        start = [camera.seq for camera in cameras]
+        time.sleep(seconds)
+        for camera in cameras:
+            camera.read(timeout=1.0)
+        process_fps = sum(c.seq - s for c, s in zip(cameras, start)) / seconds
+        for camera in cameras:
+            camera.stop()
+
+        counts_done = [0] * n
+        pipelines = [CameraPipeline(video_path, weights_path) for _ in range(n)]
+        stop = time.monotonic() + seconds
+
+        def run(i):
+            while time.monotonic() < stop:
+                ret, frame = pipelines[i].read()
+                if ret:
+                    pipelines[i].process(frame)
+                    counts_done[i] += 1
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for pipeline in pipelines:
+            pipeline.release()
+        print(f"{n:>2} cameras: processes {process_fps:7.1f} FPS | threads {sum(counts_done) / seconds:7.1f} FPS")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(*sys.argv[1:3])
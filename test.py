@@ -3,6 +3,11 @@ import numpy as np
 from ultralytics import YOLO
 import face_recognition
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "sidebar"))
+from capture import FrameGrabber
+from faces import detect_faces, detection_scale_for
 
 # Absolute path to the target image
 target_image_path = "D:\\1.Permission restricted\\Eye of the Sauron\\target.png"
@@ -20,9 +25,14 @@ if not target_encodings:
     raise ValueError("No face encodings found in the target image")
 target_encoding = target_encodings[0]
 
+# Frames above 720p are detected on a downscaled copy; set detection_scale to fix the scale,
+# or min_face_size (px) to pick the smallest scale that still finds faces that size
+detection_scale = None
+min_face_size = None
+
 # Select the camera feed
 camera_index = 1  # Change to 1 for the phone camera, 0 for laptop camera
-cap = cv2.VideoCapture(camera_index)
+cap = FrameGrabber(camera_index)  # Grabs on its own thread so we always process the newest frame
 
 if not cap.isOpened():
     raise ValueError(f"Unable to open camera feed with index: {camera_index}")
@@ -35,7 +45,7 @@ while True:
 
     # Detect faces in the frame
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    face_locations = face_recognition.face_locations(rgb_frame)
+    face_locations = detect_faces(rgb_frame, detection_scale_for(rgb_frame.shape, detection_scale, min_face_size))
     face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
 
     detected = False